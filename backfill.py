@@ -0,0 +1,293 @@
+"""
+Backfill تاریخچه ترندها از کانال‌های منبع تلگرام به HistoryStore
+بازه تاریخ به بازه‌های شناسه پیام تبدیل و به تکه‌های chunk-size شناسه‌ای تقسیم می‌شود؛
+تکه‌ها با حداکثر concurrency درخواست همزمان دریافت شده و هر پیام بلافاصله با همان پارسر
+ربات (iter_block_tokens) پارس می‌شود، پس حافظه فقط به اندازه شمارنده‌های تکه‌های در حال اجراست.
+
+- --takeout: استفاده از Takeout Session تلثون (محدودیت FloodWait بالاتر برای خروجی گرفتن انبوه)
+- --checkpoint: تکه‌های تمام‌شده ثبت می‌شوند و اجرای دوباره با همان پارامترها از ادامه کار شروع می‌کند
+  (اگر برنامه بین ثبت در تاریخچه و ذخیره Checkpoint قطع شود، همان یک تکه دوباره شمرده می‌شود)
+- شمارش‌ها با وزن هر کانال و در باکت‌های --interval ثانیه‌ای ثبت می‌شوند؛ هر باکت مثل ربات با
+  زمان پایان بازه‌اش ثبت می‌شود (پیام‌های 10:00 تا 10:30 در 10:30)
+- حذف بلاک‌های تکراری (BlockDeduplicator) مثل ربات با TTL نسبت به زمان پیام انجام می‌شود
+  (--dedup-ttl، پیش‌فرض DEDUP_TTL_SECONDS؛ 0 = غیرفعال). هر تکه به ترتیب زمان پیمایش شده و
+  مجموعه اثرانگشت خودش را دارد، پس تکراری‌های دو طرف مرز دو تکه یا بین دو کانال حذف نمی‌شوند
+- در پایان (حتی پس از قطع شدن) Segmentهای نامرتب با HistoryStore.compact دوباره مرتب می‌شوند
+
+پوشه تاریخچه فقط یک نویسنده دارد: ربات باید متوقف باشد، وگرنه Backfill با خطا متوقف می‌شود
+(یا با --history-dir در پوشه جداگانه بنویسید). برای Session تلگرام هم در صورت اجرای همزمان
+با ربات، --session جداگانه لازم است.
+
+اجرا:
+    python backfill.py --since 2024-05-01 --until 2024-06-01 --concurrency 4 --takeout
+    python backfill.py --since 2024-05-01 --channels -1001:1.5,-1002 --checkpoint backfill.json
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, UTC
+from collections import Counter, defaultdict
+from telethon import TelegramClient
+from telethon.errors import FloodWaitError, TakeoutInitDelayError
+
+from main import parse_source_channels
+from modules.parser import iter_block_tokens
+from modules.state import StateStore
+from modules.dedup import BlockDeduplicator, DEDUP_ENABLED, DEDUP_TTL_SECONDS
+from modules.history import HistoryStore, HistoryLockedError, HISTORY_DIR
+from modules.metrics import FLOOD_WAITS
+
+logger = logging.getLogger("backfill")
+
+
+def _parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UTC)
+    return parsed
+
+
+def split_id_range(first_id: int, end_id: int, chunk_size: int) -> list:
+    """تقسیم بازه [first_id, end_id) شناسه‌ها به تکه‌های [start, end)"""
+    return [
+        [start, min(start + chunk_size, end_id)]
+        for start in range(first_id, end_id, chunk_size)
+    ]
+
+
+async def resolve_id_range(fetcher, channel_id, since: datetime, until: datetime | None) -> tuple[int, int]:
+    """
+    تبدیل بازه تاریخ به بازه شناسه پیام.
+
+    Returns:
+        tuple: (first_id, end_id) - شناسه‌های [first_id, end_id) در بازه تاریخ قرار دارند
+    """
+    # offset_date آخرین پیام «قبل از» تاریخ داده‌شده را برمی‌گرداند
+    before = await fetcher.get_messages(channel_id, limit=1, offset_date=since)
+    first_id = before[0].id + 1 if before else 1
+    if until is None:
+        last = await fetcher.get_messages(channel_id, limit=1)
+    else:
+        last = await fetcher.get_messages(channel_id, limit=1, offset_date=until)
+    end_id = last[0].id + 1 if last else first_id
+    return first_id, max(first_id, end_id)
+
+
+class Checkpoint:
+    """
+    وضعیت قابل ادامه Backfill روی StateStore (نوشتن اتمیک JSON).
+    {"params": {...}, "channels": {channel_id: {"range": [first, end], "done": [[start, end], ...]}}}
+    """
+
+    def __init__(self, path: str | None, params: dict):
+        self.store = StateStore(path)
+        saved = self.store.get("params")
+        if saved is not None and saved != params:
+            raise ValueError(
+                f"Checkpoint {path} belongs to a different backfill ({saved}); "
+                "use another --checkpoint path or delete it"
+            )
+        self.store.set("params", params)
+        self._channels = self.store.get("channels") or {}
+        self.store.set("channels", self._channels)
+
+    def id_range(self, channel_id) -> tuple[int, int] | None:
+        job = self._channels.get(str(channel_id))
+        return tuple(job["range"]) if job else None
+
+    def set_id_range(self, channel_id, first_id: int, end_id: int):
+        self._channels[str(channel_id)] = {"range": [first_id, end_id], "done": []}
+        self.store.save()
+
+    def done(self, channel_id) -> set:
+        return {tuple(chunk) for chunk in self._channels[str(channel_id)]["done"]}
+
+    def mark_done(self, channel_id, chunk: list):
+        self._channels[str(channel_id)]["done"].append(list(chunk))
+        self.store.save()
+
+
+async def fetch_chunk(
+    fetcher, channel_id, chunk: list, since, until, weight: float, interval: int, dedup_ttl: int = 0
+) -> tuple[dict, int]:
+    """
+    دریافت و پارس جریانی یک تکه شناسه (قدیمی‌ترین پیام اول، تا حذف تکراری‌ها مثل ربات باشد).
+
+    Returns:
+        tuple: ({bucket_end: {chain: Counter}}, تعداد پیام‌های دیده‌شده) - bucket_end پایان بازه
+            interval ثانیه‌ای پیام است، همان قرارداد زمان رکوردهای ربات
+    """
+    start, end = chunk
+    buckets = defaultdict(lambda: defaultdict(Counter))
+    dedup = BlockDeduplicator(ttl=dedup_ttl) if dedup_ttl > 0 else None
+    seen = 0
+    async for msg in fetcher.iter_messages(channel_id, limit=None, min_id=start - 1, max_id=end, reverse=True):
+        seen += 1
+        if not getattr(msg, "text", None) or msg.date < since or (until is not None and msg.date >= until):
+            continue
+        timestamp = msg.date.timestamp()
+        bucket_end = int(timestamp - timestamp % interval) + interval
+        for chain, block_tokens in iter_block_tokens((msg,), dedup):
+            counter = buckets[bucket_end][chain]
+            for symbol in block_tokens:
+                counter[symbol] += weight
+    return buckets, seen
+
+
+async def backfill_channel(fetcher, args, channel_id, weight, checkpoint, history, semaphore, progress):
+    id_range = checkpoint.id_range(channel_id)
+    if id_range is None:
+        async with semaphore:
+            id_range = await resolve_id_range(fetcher, channel_id, args.since, args.until)
+        checkpoint.set_id_range(channel_id, *id_range)
+
+    done = checkpoint.done(channel_id)
+    chunks = [chunk for chunk in split_id_range(*id_range, args.chunk_size) if tuple(chunk) not in done]
+    logger.info(
+        f"Channel {channel_id}: ids {id_range[0]}..{id_range[1] - 1}, "
+        f"{len(chunks)} chunks pending ({len(done)} already done)"
+    )
+
+    async def run_chunk(chunk):
+        while True:
+            try:
+                async with semaphore:
+                    buckets, seen = await fetch_chunk(
+                        fetcher, channel_id, chunk, args.since, args.until, weight, args.interval, args.dedup_ttl
+                    )
+                break
+            except FloodWaitError as e:
+                # Backfill آفلاین است؛ فقط همین تکه صبر کرده و دوباره تلاش می‌کند
+                FLOOD_WAITS.inc(where="backfill")
+                logger.warning(f"Channel {channel_id} chunk {chunk}: FloodWait {e.seconds}s")
+                await asyncio.sleep(e.seconds)
+
+        tokens = 0
+        for bucket_ts, chains in buckets.items():
+            for chain, counter in chains.items():
+                history.append(bucket_ts, chain, counter)
+                tokens += len(counter)
+        checkpoint.mark_done(channel_id, chunk)
+        progress["chunks"] += 1
+        progress["messages"] += seen
+        logger.info(
+            f"Channel {channel_id} chunk {chunk[0]}..{chunk[1] - 1}: {seen} messages, "
+            f"{tokens} symbol counts in {len(buckets)} buckets "
+            f"[{progress['chunks']}/{progress['total'] or '?'} chunks]"
+        )
+
+    progress["total"] += len(chunks)
+    await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+
+async def run_backfill(client, args, channels: dict, history: HistoryStore):
+    checkpoint = Checkpoint(args.checkpoint, {
+        "since": args.since.isoformat(),
+        "until": args.until.isoformat() if args.until else None,
+        "interval": args.interval,
+        "chunk_size": args.chunk_size,
+        "dedup_ttl": args.dedup_ttl,
+    })
+    semaphore = asyncio.Semaphore(args.concurrency)
+    progress = {"chunks": 0, "messages": 0, "total": 0}
+    started = time.perf_counter()
+
+    async def run_all(fetcher):
+        await asyncio.gather(*(
+            backfill_channel(fetcher, args, channel_id, weight, checkpoint, history, semaphore, progress)
+            for channel_id, weight in channels.items()
+        ))
+
+    try:
+        if args.takeout:
+            try:
+                async with client.takeout(finalize=True, channels=True, megagroups=True) as takeout:
+                    await run_all(takeout)
+                    return progress
+            except TakeoutInitDelayError as e:
+                logger.warning(
+                    f"Takeout session not available for {e.seconds}s "
+                    "(confirm it in another Telegram client); continuing without takeout"
+                )
+        await run_all(client)
+        return progress
+    finally:
+        # تکه‌ها خارج از ترتیب زمان ثبت می‌شوند؛ مرتب‌سازی Segmentها جستجوی دودویی را برمی‌گرداند
+        history.compact()
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"Backfill: {progress['messages']} messages in {progress['chunks']} chunks, "
+            f"{elapsed:.1f}s ({progress['messages'] / max(elapsed, 1e-9):,.0f} msg/s)"
+        )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Concurrent historical backfill into the trend history store")
+    arg_parser.add_argument("--since", type=_parse_date, required=True, help="start date (ISO, UTC if naive)")
+    arg_parser.add_argument("--until", type=_parse_date, default=None, help="end date, exclusive (default: now)")
+    arg_parser.add_argument("--channels", default=None,
+                            help="channel ids with optional weights (default: SOURCE_CHANNELS from .env)")
+    arg_parser.add_argument("--interval", type=int, default=int(os.getenv("LOOP_INTERVAL_SECONDS", 1800)),
+                            help="history bucket length in seconds")
+    arg_parser.add_argument("--chunk-size", type=int, default=2000, help="message ids per chunk")
+    arg_parser.add_argument("--concurrency", type=int, default=4, help="chunks fetched in parallel")
+    arg_parser.add_argument("--dedup-ttl", type=int, default=DEDUP_TTL_SECONDS if DEDUP_ENABLED else 0,
+                            help="drop repeated heatmap blocks seen within this many seconds (0 = off)")
+    arg_parser.add_argument("--takeout", action="store_true", help="use a Telegram takeout session")
+    arg_parser.add_argument("--checkpoint", default="backfill_checkpoint.json", help="resumable progress file")
+    arg_parser.add_argument("--history-dir", default=HISTORY_DIR)
+    arg_parser.add_argument("--session", default=os.getenv("SESSION_NAME", "trend_scanner"))
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    if args.chunk_size <= 0 or args.concurrency <= 0 or args.interval <= 0:
+        arg_parser.error("--chunk-size, --concurrency and --interval must be positive")
+    if args.dedup_ttl < 0:
+        arg_parser.error("--dedup-ttl must not be negative")
+    if args.until is not None and args.until <= args.since:
+        arg_parser.error("--until must be after --since")
+
+    try:
+        channels = parse_source_channels(
+            args.channels or os.getenv("SOURCE_CHANNELS"), None if args.channels else os.getenv("SOURCE_CHANNEL_ID")
+        )
+        api_id = int(os.getenv("API_ID"))
+    except (ValueError, TypeError) as e:
+        logger.error(f"Invalid configuration: {e}")
+        return 1
+
+    try:
+        history = HistoryStore(args.history_dir)
+    except HistoryLockedError as e:
+        logger.error(f"{e}; stop the bot or pass a separate --history-dir")
+        return 1
+
+    client = TelegramClient(args.session, api_id, os.getenv("API_HASH"))
+
+    async def run():
+        async with client:
+            await run_backfill(client, args, channels, history)
+
+    try:
+        asyncio.run(run())
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        logger.info(f"Interrupted; rerun with --checkpoint {args.checkpoint} to resume")
+        return 130
+    finally:
+        history.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+بنچمارک بار و تاخیر غنی‌سازی (enrich_top_lists) در برابر Providerهای شبیه‌سازی‌شده.
+
+هر دو API (Birdeye و Dexscreener) با httpx.MockTransport شبیه‌سازی می‌شوند؛ توزیع تاخیر،
+نرخ 429 و نرخ خطای 5xx/521 هر Provider از خط فرمان قابل تنظیم است و هیچ درخواستی به
+اینترنت ارسال نمی‌شود.
+
+اجرا:
+    python benchmarks/bench_enricher.py --rounds 20 --birdeye-error-rate 0.3 --birdeye-error-code 521
+    python benchmarks/bench_enricher.py --strategy hedge --birdeye-latency 2.0 --dex-latency 0.2
+    python benchmarks/bench_enricher.py --birdeye-error-rate 1 --overlap 0.6
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+from modules import cache as cache_module  # noqa: E402
+from modules import enricher, ratelimit, metrics, health  # noqa: E402
+
+BIRDEYE_HOST = "birdeye.mock"
+DEX_HOST = "dexscreener.mock"
+
+
+class ProviderProfile:
+    """رفتار شبیه‌سازی‌شده یک Provider: تاخیر لاگ‌نرمال، نرخ 429 و نرخ خطای سرور"""
+
+    def __init__(self, median: float, sigma: float, rate_limit_rate: float,
+                 error_rate: float, error_code: int, retry_after: float | None):
+        self.median = median
+        self.sigma = sigma
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+    def latency(self, rng: random.Random) -> float:
+        if self.sigma <= 0:
+            return self.median
+        return rng.lognormvariate(0, self.sigma) * self.median
+
+
+class MockProviders:
+    """Handler غیرهمزمان MockTransport که بر اساس Host درخواست را به Provider مربوطه می‌فرستد"""
+
+    def __init__(self, birdeye: ProviderProfile, dex: ProviderProfile, timeout: float, seed: int):
+        self.profiles = {BIRDEYE_HOST: birdeye, DEX_HOST: dex}
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.requests = Counter()
+        self.statuses = Counter()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        profile = self.profiles[host]
+        self.requests[host] += 1
+
+        latency = profile.latency(self.rng)
+        if latency >= self.timeout:
+            await asyncio.sleep(self.timeout)
+            self.statuses[(host, "timeout")] += 1
+            raise httpx.ReadTimeout("mock timeout", request=request)
+        await asyncio.sleep(latency)
+
+        roll = self.rng.random()
+        if roll < profile.rate_limit_rate:
+            self.statuses[(host, 429)] += 1
+            headers = {"Retry-After": str(profile.retry_after)} if profile.retry_after is not None else {}
+            return httpx.Response(429, headers=headers, text="rate limited")
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            self.statuses[(host, profile.error_code)] += 1
+            return httpx.Response(profile.error_code, text="mock server error")
+
+        self.statuses[(host, 200)] += 1
+        if host == BIRDEYE_HOST:
+            symbol = request.url.params.get("symbol", "")
+            return httpx.Response(200, json={
+                "data": [{"address": f"BE{symbol}{'x' * 30}", "volume_24h": 1000}]
+            })
+
+        # جستجوی Dexscreener: نماد آخرین کلمه پارامتر q است (پاسخ شامل جفت‌های هر دو زنجیره)
+        symbol = request.url.params.get("q", "").split()[-1]
+        pairs = [
+            {
+                "chainId": chain,
+                "baseToken": {"symbol": symbol, "address": f"DX{chain}{symbol}{'y' * 24}"},
+                "liquidity": {"usd": 50_000},
+                "volume": {"h24": 10_000},
+            }
+            for chain in ("solana", "bsc")
+        ]
+        return httpx.Response(200, json={"pairs": pairs})
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _random_top(rng: random.Random, round_no: int, size: int) -> list:
+    return [(f"$T{round_no}X{rng.randrange(10**6)}", size - i) for i in range(size)]
+
+
+def _with_overlap(top_sol: list, top_bnb: list, overlap: float) -> list:
+    """بخشی از نمادهای BNB را با نمادهای SOL جایگزین می‌کند (تیکر مشترک روی دو زنجیره)"""
+    shared = round(len(top_bnb) * overlap)
+    return [(top_sol[i][0], count) if i < shared else (symbol, count) for i, (symbol, count) in enumerate(top_bnb)]
+
+
+async def run_benchmark(args) -> None:
+    mock = MockProviders(
+        ProviderProfile(args.birdeye_latency, args.birdeye_sigma, args.birdeye_429_rate,
+                        args.birdeye_error_rate, args.birdeye_error_code, args.retry_after),
+        ProviderProfile(args.dex_latency, args.dex_sigma, args.dex_429_rate,
+                        args.dex_error_rate, args.dex_error_code, args.retry_after),
+        timeout=enricher.REQUEST_TIMEOUT,
+        seed=args.seed,
+    )
+
+    # پیکربندی ماژول‌ها برای اجرای ایزوله (بدون کش و بدون شبکه واقعی)
+    cache_module.ADDRESS_CACHE_ENABLED = False
+    enricher.BIRDEYE_API = f"http://{BIRDEYE_HOST}/defi/search"
+    enricher.DEX_API = f"http://{DEX_HOST}/latest/dex/search"
+    enricher.ENRICH_STRATEGY = args.strategy
+    enricher.HEDGE_DELAY_SECONDS = args.hedge_delay
+    ratelimit.BACKOFF_BASE_SECONDS = args.backoff_base
+    ratelimit.BACKOFF_MAX_SECONDS = args.backoff_max
+    ratelimit.reset_limiters()
+    health.reset_health()
+
+    rng = random.Random(args.seed)
+    latencies = []
+    resolved = 0
+    resolved_in_budget = 0
+    symbols = 0
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(mock)) as client:
+        for round_no in range(args.rounds):
+            top_sol = _random_top(rng, round_no, args.symbols)
+            top_bnb = _with_overlap(top_sol, _random_top(rng, round_no, args.symbols), args.overlap)
+
+            tops = {"SOL": top_sol, "BNB": top_bnb}
+            started = time.perf_counter()
+            if args.budget is None:
+                enriched = await enricher.enrich_top_lists(tops, client)
+                partial = enriched
+            else:
+                # تاخیر انتشار = بودجه یا زودتر؛ آدرس‌های دیررس پس از آن تکمیل می‌شوند
+                partial, completion = await enricher.enrich_within(tops, client, args.budget)
+                latencies.append(time.perf_counter() - started)
+                enriched = await completion if completion is not None else partial
+            if args.budget is None:
+                latencies.append(time.perf_counter() - started)
+
+            symbols += len(top_sol) + len(top_bnb)
+            resolved += sum(1 for top in enriched.values() for _, _, addr in top if addr)
+            resolved_in_budget += sum(1 for top in partial.values() for _, _, addr in top if addr)
+
+    total_requests = sum(mock.requests.values())
+    limiter_stats = {name: limiter.stats() for name, limiter in ratelimit.all_limiters().items()}
+    backoff = sum(s["backoff_seconds"] for s in limiter_stats.values())
+    throttled = sum(s["throttled_seconds"] for s in limiter_stats.values())
+
+    budget = f" budget={args.budget}s" if args.budget is not None else ""
+    print(f"strategy={args.strategy} rounds={args.rounds} symbols/round={args.symbols * 2}{budget}")
+    print(
+        f"enrich latency  p50={_percentile(latencies, 50):.3f}s "
+        f"p95={_percentile(latencies, 95):.3f}s p99={_percentile(latencies, 99):.3f}s "
+        f"max={max(latencies):.3f}s"
+    )
+    print(f"resolved        {resolved}/{symbols} symbols ({resolved_in_budget} at publish time)")
+    print(
+        f"requests/symbol {total_requests / symbols:.2f} "
+        f"(birdeye={mock.requests[BIRDEYE_HOST]}, dexscreener={mock.requests[DEX_HOST]})"
+    )
+    dex_searches = metrics.DEX_SEARCHES.snapshot()
+    print("dex lookups     " + ", ".join(f"{source}={n:g}" for source, n in sorted(dex_searches.items())))
+    print("breakers        " + ", ".join(
+        f"{name}={h.state} (ok={h.success_rate():.2f}, lat={h.mean_latency():.3f}s)"
+        for name, h in health.all_health().items()
+    ))
+    print(f"retry sleep     backoff={backoff:.2f}s throttled={throttled:.2f}s")
+    print("responses       " + ", ".join(f"{host.split('.')[0]}:{status}={n}" for (host, status), n in sorted(
+        mock.statuses.items(), key=lambda item: (item[0][0], str(item[0][1]))
+    )))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Enrichment latency/load benchmark against mock providers")
+    arg_parser.add_argument("--rounds", type=int, default=20, help="number of enrich_top_lists calls")
+    arg_parser.add_argument("--symbols", type=int, default=5, help="symbols per chain per round")
+    arg_parser.add_argument("--strategy", choices=("failover", "hedge"), default=enricher.ENRICH_STRATEGY)
+    arg_parser.add_argument("--hedge-delay", type=float, default=enricher.HEDGE_DELAY_SECONDS)
+    arg_parser.add_argument("--backoff-base", type=float, default=ratelimit.BACKOFF_BASE_SECONDS)
+    arg_parser.add_argument("--backoff-max", type=float, default=ratelimit.BACKOFF_MAX_SECONDS)
+    arg_parser.add_argument("--retry-after", type=float, default=None, help="Retry-After sent with mock 429s")
+    arg_parser.add_argument("--overlap", type=float, default=0.0, help="fraction of BNB symbols also trending on SOL")
+    arg_parser.add_argument("--budget", type=float, default=None,
+                            help="enrichment time budget per round (enrich_within); latency = time to publish")
+    arg_parser.add_argument("--seed", type=int, default=7)
+    arg_parser.add_argument("--log-level", default="ERROR", help="enricher log level during the run")
+    for name, latency in (("birdeye", 0.15), ("dex", 0.10)):
+        arg_parser.add_argument(f"--{name}-latency", type=float, default=latency, help="median latency (s)")
+        arg_parser.add_argument(f"--{name}-sigma", type=float, default=0.5, help="lognormal sigma (0 = fixed)")
+        arg_parser.add_argument(f"--{name}-429-rate", type=float, default=0.0)
+        arg_parser.add_argument(f"--{name}-error-rate", type=float, default=0.0)
+        arg_parser.add_argument(f"--{name}-error-code", type=int, default=521 if name == "birdeye" else 503)
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s | %(name)s | %(message)s")
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+بنچمارک توان عملیاتی پارسر Heatmap روی یک پیکره مصنوعی.
+
+پیاده‌سازی فعلی (modules.parser) با نسخه قدیمی مبتنی بر re.findall مقایسه می‌شود.
+
+اجرا:
+    python benchmarks/bench_parser.py --messages 5000 --repeat 3
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.parser import parse_messages  # noqa: E402
+
+_SYMBOLS = [
+    "$WIF", "$BONK", "$POPCAT", "$MEW", "$CAKE", "$BABYDOGE", "#TRUMP", "PEPE",
+    "狗狗币", "$FLOKI", "$SLERF", "$BOME", "$MOG", "$TST", "$BANANA", "$ZEREBRO",
+]
+
+
+def legacy_parse_messages(messages: list) -> tuple[list, list]:
+    """پیاده‌سازی قبلی پارسر (دو re.findall کامپایل‌نشده با DOTALL برای هر پیام)"""
+    sol_tokens = []
+    bnb_tokens = []
+    bnb_block_pattern = r"Trending.*\$BNB Heatmap(.*?)(?:Updated every|$)"
+    sol_block_pattern = r"Trending.*\$SOL Heatmap(.*?)(?:Updated every|$)"
+    token_pattern = re.compile(r"\d+\.\s+([$#]?[A-Za-z0-9\u4e00-\u9fa5]+)", re.UNICODE)
+
+    for message in messages:
+        text = getattr(message, "text", None)
+        if not isinstance(text, str) or not text.strip():
+            continue
+        for bnb_block in re.findall(bnb_block_pattern, text, re.DOTALL):
+            tokens = token_pattern.findall(bnb_block)
+            bnb_tokens.extend(t.strip() for t in tokens if t.strip())
+        for sol_block in re.findall(sol_block_pattern, text, re.DOTALL):
+            tokens = token_pattern.findall(sol_block)
+            sol_tokens.extend(t.strip() for t in tokens if t.strip())
+    return sol_tokens, bnb_tokens
+
+
+def _heatmap_block(rng: random.Random, chain: str) -> str:
+    lines = [f"📊 ${chain} Heatmap"]
+    for idx, symbol in enumerate(rng.sample(_SYMBOLS, 10), 1):
+        lines.append(f"{idx}. {symbol} | MC ${rng.randint(10, 900)}K | {rng.randint(-50, 300)}%")
+    lines.append(f"Updated every {rng.choice([5, 10, 15])} min")
+    return "\n".join(lines)
+
+
+def build_corpus(count: int, seed: int = 42, noise_lines: int = 40) -> list:
+    """
+    ساخت پیکره مصنوعی از پیام‌های Heatmap همراه با متن اضافی برای طولانی کردن پیام‌ها.
+    خطوط اضافی شامل کلمه Trending هستند تا حالت Backtracking الگوی قدیمی هم سنجیده شود.
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        parts = ["🔥 Trending tokens right now 🔥"]
+        parts.extend(f"Trending note {i}: ${rng.choice(_SYMBOLS)} volume spike" for i in range(rng.randint(0, noise_lines)))
+        parts.append(_heatmap_block(rng, "SOL"))
+        parts.extend("disclaimer: not financial advice" for _ in range(rng.randint(0, noise_lines)))
+        parts.append(_heatmap_block(rng, "BNB"))
+        corpus.append(SimpleNamespace(text="\n".join(parts)))
+    return corpus
+
+
+def _measure(func, corpus: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(corpus)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Heatmap parser throughput benchmark")
+    arg_parser.add_argument("--messages", type=int, default=5000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--noise-lines", type=int, default=40)
+    args = arg_parser.parse_args()
+
+    corpus = build_corpus(args.messages, noise_lines=args.noise_lines)
+    avg_len = sum(len(m.text) for m in corpus) / len(corpus)
+
+    legacy_result = legacy_parse_messages(corpus)
+    current_result = parse_messages(corpus)
+    if legacy_result != (current_result.get("SOL", []), current_result.get("BNB", [])):
+        print("WARNING: legacy and current parsers disagree on this corpus")
+
+    legacy_time = _measure(legacy_parse_messages, corpus, args.repeat)
+    current_time = _measure(parse_messages, corpus, args.repeat)
+
+    print(f"corpus: {len(corpus)} messages, avg {avg_len:.0f} chars")
+    print("tokens: " + " ".join(f"{chain}={len(tokens)}" for chain, tokens in current_result.items()))
+    print(f"legacy : {len(corpus) / legacy_time:12,.0f} msg/s ({legacy_time * 1000:.1f} ms)")
+    print(f"current: {len(corpus) / current_time:12,.0f} msg/s ({current_time * 1000:.1f} ms)")
+    print(f"speedup: {legacy_time / current_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,30 +11,75 @@ load_dotenv()
 
 import os
 import sys
+import time
+import queue
+import atexit
 import asyncio
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from datetime import datetime, timedelta, UTC
-from telethon import TelegramClient
+from collections import Counter
+from telethon import TelegramClient, events
 from telethon.errors import FloodWaitError, ChannelPrivateError
 
 # اکنون ماژول‌ها با اطمینان از بارگذاری .env ایمپورت می‌شوند
-from modules.parser import parse_messages
-from modules.analyzer import analyze_frequency
-from modules.enricher import enrich_top_lists
-from modules.formatter import format_output_message
+from modules.parser import iter_block_tokens
+from modules.analyzer import analyze_frequency, SlidingWindowAnalyzer
+from modules.velocity import analyze_velocity
+from modules.enricher import enrich_within, create_http_client
+from modules.formatter import format_output_message, format_multi_window_message
+from modules.cache import close_address_cache
+from modules.state import StateStore
+from modules.stream import StreamCollector
+from modules.dedup import BlockDeduplicator, DEDUP_ENABLED
+from modules.publisher import ReportPublisher, POSTED, EDITED, UNCHANGED
+from modules import health
+from modules.history import HistoryStore, HistoryLockedError, HISTORY_ENABLED
+from modules import metrics
+from modules.chains import chain_keys, unknown_chains
+from modules.scheduling import CycleDeadline, TickScheduler
+from modules.metrics import (
+    STAGE_SECONDS, CHANNEL_FETCH_SECONDS, FLOOD_WAITS, CYCLES, LOG_RECORDS_DROPPED,
+    DEADLINE_EXCEEDED, SKIPPED_TICKS,
+)
 
 logger = logging.getLogger(__name__)
 
 LOG_FORMAT = '%(asctime)s | %(levelname)s | %(name)s | %(message)s'
 LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+# ظرفیت صف لاگ؛ در صورت پر شدن رکوردها دور ریخته می‌شوند تا حلقه asyncio هرگز مسدود نشود
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler با صف محدود: رکورد اضافی به جای انتظار دور ریخته و شمرده می‌شود"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_RECORDS_DROPPED.inc()
+
 
 def setup_logging():
-    """راه‌اندازی سیستم لاگ چرخشی (۵ مگابایت) و لاگ کنسول"""
+    """
+    راه‌اندازی سیستم لاگ چرخشی (۵ مگابایت) و لاگ کنسول.
+    نوشتن روی دیسک و stdout در نخ جداگانه QueueListener انجام می‌شود و حلقه asyncio
+    فقط رکورد را در یک صف محدود قرار می‌دهد.
+
+    Returns:
+        QueueListener: هنگام خروج برنامه (atexit) متوقف شده و صف تخلیه می‌شود
+    """
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
     
     formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT)
+    handlers = []
     
     try:
         file_handler = RotatingFileHandler(
@@ -43,7 +88,7 @@ def setup_logging():
             backupCount=1
         )
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
     except PermissionError:
         print("Error: Permission denied to write log file 'scanner.log'.")
     except Exception as e:
@@ -51,14 +96,41 @@ def setup_logging():
 
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root_logger.addHandler(DroppingQueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    # تخلیه صف پیش از خروج (حتی در exit(1) هنگام خطای تنظیمات)
+    atexit.register(listener.stop)
 
     # لاگ‌نویسی هوشمند و فشرده:
     # نادیده گرفتن لاگ‌های INFO از کتابخانه‌های شلوغ
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("telethon").setLevel(logging.WARNING)
     logger.info("لاگ‌نویسی راه‌اندازی شد. لاگ‌های httpx و telethon روی WARNING تنظیم شدند.")
+    return listener
+
 
+def parse_source_channels(raw: str | None, fallback: str | None) -> dict:
+    """
+    خواندن لیست کانال‌های منبع با وزن اختیاری، مثلاً: "-1001:1.5,-1002,-1003:0.5"
+    در صورت خالی بودن SOURCE_CHANNELS از SOURCE_CHANNEL_ID قدیمی استفاده می‌شود.
+
+    Returns:
+        dict: {channel_id: weight}
+    """
+    channels = {}
+    for item in (raw or fallback or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        channel, _, weight = item.partition(":")
+        channels[int(channel)] = float(weight) if weight else 1.0
+    if not channels:
+        raise ValueError("هیچ کانال منبعی (SOURCE_CHANNELS یا SOURCE_CHANNEL_ID) تعریف نشده است")
+    return channels
 
 def load_config():
     """بارگذاری و اعتبارسنجی تنظیمات از .env"""
@@ -67,10 +139,71 @@ def load_config():
             'API_ID': int(os.getenv("API_ID")),
             'API_HASH': os.getenv("API_HASH"),
             'SESSION_NAME': os.getenv("SESSION_NAME", "trend_scanner"),
-            'SOURCE_CHANNEL_ID': int(os.getenv("SOURCE_CHANNEL_ID")),
+            'SOURCE_CHANNELS': parse_source_channels(
+                os.getenv("SOURCE_CHANNELS"), os.getenv("SOURCE_CHANNEL_ID")
+            ),
+            # حداکثر تعداد کانال‌هایی که همزمان خوانده می‌شوند
+            'FETCH_CONCURRENCY': int(os.getenv("FETCH_CONCURRENCY", 4)),
+            # FloodWait کوتاه‌تر از این مقدار فقط برای همان کانال صبر و تکرار می‌شود؛ بلندتر -> رد شدن کانال در این چرخه
+            'FLOOD_WAIT_MAX_SLEEP': int(os.getenv("FLOOD_WAIT_MAX_SLEEP", 30)),
+            # حداکثر قدمت پیام‌هایی که پس از توقف طولانی یا چرخه‌های ناموفق بازخوانی می‌شوند (0 = بدون سقف)
+            'MAX_CATCH_UP_SECONDS': int(os.getenv("MAX_CATCH_UP_SECONDS", 24 * 3600)),
             'DEST_CHANNEL_ID': int(os.getenv("DESTINATION_CHANNEL_ID")),
             'LOOP_INTERVAL_SECONDS': int(os.getenv("LOOP_INTERVAL_SECONDS", 1800)),
+            'STATE_PATH': os.getenv("STATE_PATH", "scanner_state.json"),
+            # poll: دریافت دوره‌ای تاریخچه | stream: پارس لحظه‌ای پیام‌ها با هندلرهای تلثون
+            'SCAN_MODE': os.getenv("SCAN_MODE", "poll").lower(),
         }
+        config['PUBLISH_INTERVAL_SECONDS'] = int(
+            os.getenv("PUBLISH_INTERVAL_SECONDS", config['LOOP_INTERVAL_SECONDS'])
+        )
+        # پنجره‌های زمانی تحلیل لغزان (دقیقه) و انتشار اختیاری خلاصه چند افقی
+        config['TREND_WINDOWS'] = [
+            int(w) for w in os.getenv("TREND_WINDOWS", "30,60,360,1440").split(",") if w.strip()
+        ]
+        config['PUBLISH_MULTI_WINDOW'] = os.getenv("PUBLISH_MULTI_WINDOW", "0") == "1"
+        # frequency: پرتکرارترین‌ها | velocity: بیشترین رشد و شتاب نسبت به دوره‌های قبل
+        config['ANALYZER_MODE'] = os.getenv("ANALYZER_MODE", "frequency").lower()
+        # post: پیام جدید در هر چرخه | edit: ویرایش گزارش قبلی و رد کردن گزارش بدون تغییر
+        config['PUBLISH_MODE'] = os.getenv("PUBLISH_MODE", "post").lower()
+        # در حالت edit، فاصله انتشار یک پیام کاملاً جدید (ثانیه)
+        config['REPOST_INTERVAL_SECONDS'] = int(os.getenv("REPOST_INTERVAL_SECONDS", 6 * 3600))
+        # مهلت هر چرخه و بودجه مراحل دریافت و غنی‌سازی (ثانیه)؛ پیش‌فرض: ۸۰٪ بازه چرخه
+        interval = (
+            config['PUBLISH_INTERVAL_SECONDS'] if config['SCAN_MODE'] == 'stream'
+            else config['LOOP_INTERVAL_SECONDS']
+        )
+        config['CYCLE_DEADLINE_SECONDS'] = float(os.getenv("CYCLE_DEADLINE_SECONDS", interval * 0.8))
+        config['FETCH_BUDGET_SECONDS'] = float(
+            os.getenv("FETCH_BUDGET_SECONDS", config['CYCLE_DEADLINE_SECONDS'] * 0.4)
+        )
+        config['ENRICH_BUDGET_SECONDS'] = float(
+            os.getenv("ENRICH_BUDGET_SECONDS", config['CYCLE_DEADLINE_SECONDS'] * 0.3)
+        )
+        # زنجیره‌های فعال به ترتیب انتشار (تعریف زنجیره‌ها در modules/chains.py)
+        config['ENABLED_CHAINS'] = chain_keys()
+        
+        if unknown_chains():
+            raise ValueError(f"زنجیره ناشناخته در ENABLED_CHAINS: {', '.join(unknown_chains())}")
+        
+        if not config['ENABLED_CHAINS']:
+            raise ValueError("ENABLED_CHAINS خالی است")
+        
+        if not 0 < config['CYCLE_DEADLINE_SECONDS'] <= interval:
+            raise ValueError(f"CYCLE_DEADLINE_SECONDS باید بین 0 و {interval} باشد")
+        
+        for key in ('FETCH_BUDGET_SECONDS', 'ENRICH_BUDGET_SECONDS'):
+            if not 0 < config[key] <= config['CYCLE_DEADLINE_SECONDS']:
+                raise ValueError(f"{key} باید بین 0 و CYCLE_DEADLINE_SECONDS باشد")
+        
+        if config['SCAN_MODE'] not in ('poll', 'stream'):
+            raise ValueError(f"SCAN_MODE نامعتبر است: {config['SCAN_MODE']}")
+        
+        if config['ANALYZER_MODE'] not in ('frequency', 'velocity'):
+            raise ValueError(f"ANALYZER_MODE نامعتبر است: {config['ANALYZER_MODE']}")
+        
+        if config['PUBLISH_MODE'] not in ('post', 'edit'):
+            raise ValueError(f"PUBLISH_MODE نامعتبر است: {config['PUBLISH_MODE']}")
         
         if not config['API_HASH']:
             raise ValueError("API_HASH خالی است")
@@ -83,6 +216,9 @@ def load_config():
         logger.error("!!! لطفاً مطمئن شوید API_ID, API_HASH, و ID کانال‌ها به درستی در فایل .env وارد شده‌اند.")
         exit(1)
 
+# Taskهای پس‌زمینه (تکمیل آدرس‌های دیررس) تا پایان اجرا ارجاع نگه داشته می‌شوند
+_background_tasks = set()
+
 async def notify_admin(client, message, config):
     """ارسال پیام وضعیت به ادمین (Saved Messages) - همیشه فعال"""
     try:
@@ -90,79 +226,297 @@ async def notify_admin(client, message, config):
     except Exception as e:
         logger.warning(f"Failed to send admin notification: {e}")
 
-async def process_trends(client, config):
-    """پردازش اصلی: دریافت، تحلیل و انتشار ترندها"""
-    try:
-        now = datetime.now(UTC)
-        since = now - timedelta(seconds=config['LOOP_INTERVAL_SECONDS'])
-        
-        logger.info(f"→ شروع اسکن پیام‌ها از {since.strftime('%H:%M:%S')}")
-        await notify_admin(client, "🔍 چرخه اسکن جدید آغاز شد...", config)
-        
-        messages = []
-        async for msg in client.iter_messages(
-            config['SOURCE_CHANNEL_ID'],
-            limit=200
-        ):
-            if msg.date < since:
-                break
-            if msg.date >= since and getattr(msg, "text", None):
-                messages.append(msg)
-        
-        if not messages:
-            logger.warning("⚠ هیچ پیامی در این بازه زمانی یافت نشد")
-            await notify_admin(client, "ℹ️ هیچ پیام جدیدی یافت نشد.", config)
-            return
-        
-        logger.info(f"✓ {len(messages)} پیام دریافت شد")
-        
-        sol_tokens, bnb_tokens = parse_messages(messages)
-        total_tokens = len(sol_tokens) + len(bnb_tokens)
-        
-        if total_tokens == 0:
-            logger.warning("⚠ هیچ توکنی شناسایی نشد")
-            await notify_admin(client, "ℹ️ هیچ توکنی در پیام‌ها شناسایی نشد.", config)
-            return
+async def fetch_new_messages(client, channel_id, since, last_seen_id: int, max_catch_up: int = 0):
+    """
+    دریافت افزایشی پیام‌ها: همه پیام‌های جدیدتر از last_seen_id (با min_id) و بدون سقف تعداد.
+    since فقط در اولین دریافت (بدون last_seen_id) مرز پایین است؛ پس از آن هیچ پیامی
+    بعد از شناسه ثبت‌شده رها نمی‌شود (مثلاً پیام‌های چرخه ناموفق یا کانال ردشده)،
+    مگر قدیمی‌تر از max_catch_up ثانیه باشد.
+
+    Returns:
+        tuple: (messages, max_id) - پیام‌های متنی و بزرگ‌ترین شناسه دیده‌شده
+    """
+    messages = []
+    max_id = last_seen_id
+    if not last_seen_id:
+        cutoff = since
+    elif max_catch_up > 0:
+        cutoff = datetime.now(UTC) - timedelta(seconds=max_catch_up)
+    else:
+        cutoff = None
+    
+    async for msg in client.iter_messages(
+        channel_id,
+        limit=None,
+        min_id=last_seen_id
+    ):
+        if cutoff is not None and msg.date < cutoff:
+            if last_seen_id:
+                logger.warning(
+                    f"⚠ کانال {channel_id}: پیام‌های قدیمی‌تر از {max_catch_up} ثانیه "
+                    f"(از شناسه {last_seen_id} تا {msg.id}) بازخوانی نمی‌شوند"
+                )
+            break
+        max_id = max(max_id, msg.id)
+        if getattr(msg, "text", None):
+            messages.append(msg)
+    
+    return messages, max_id
+
+async def fetch_channel(client, config, channel_id, since, last_seen_id: int, semaphore, deadline_at=None):
+    """
+    دریافت پیام‌های یک کانال زیر سمافور مشترک.
+    FloodWait فقط همین کانال را متوقف می‌کند: انتظار کوتاه بیرون از سمافور و یک تلاش مجدد،
+    و در غیر این صورت کانال در این چرخه رد می‌شود.
+    اگر دریافت تا deadline_at (زمان حلقه asyncio) تمام نشود هم کانال رد می‌شود؛ شناسه آخرین
+    پیام جلو نمی‌رود و پیام‌ها در چرخه بعد خوانده می‌شوند.
+
+    Returns:
+        tuple | None: (messages, max_id) یا None اگر کانال رد شد
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        try:
+            async with asyncio.timeout_at(deadline_at), semaphore:
+                started = time.perf_counter()
+                messages, max_id = await fetch_new_messages(
+                    client, channel_id, since, last_seen_id, config['MAX_CATCH_UP_SECONDS']
+                )
+            elapsed = time.perf_counter() - started
+            CHANNEL_FETCH_SECONDS.observe(elapsed, channel=channel_id)
+            logger.info(f"✓ کانال {channel_id}: {len(messages)} پیام در {elapsed:.2f} ثانیه")
+            return messages, max_id
         
-        logger.info(f"✓ {len(sol_tokens)} توکن SOL و {len(bnb_tokens)} توکن BNB استخراج شد")
+        except TimeoutError:
+            DEADLINE_EXCEEDED.inc(stage="fetch")
+            logger.error(f"✗ کانال {channel_id}: بودجه زمانی دریافت تمام شد، در این چرخه رد شد")
+            return None
         
-        top_sol, top_bnb = analyze_frequency(sol_tokens, bnb_tokens)
-        logger.info(f"✓ تحلیل فرکانس انجام شد")
+        except FloodWaitError as e:
+            FLOOD_WAITS.inc(where="fetch")
+            fits_budget = deadline_at is None or loop.time() + e.seconds < deadline_at
+            if attempt == 0 and e.seconds <= config['FLOOD_WAIT_MAX_SLEEP'] and fits_budget:
+                logger.warning(f"⏳ کانال {channel_id}: FloodWait {e.seconds} ثانیه، تلاش مجدد پس از انتظار")
+                await asyncio.sleep(e.seconds)
+                continue
+            logger.error(f"✗ کانال {channel_id}: FloodWait {e.seconds} ثانیه، در این چرخه رد شد")
+            return None
         
-        logger.info("→ در حال واکشی آدرس قراردادها...")
-        enriched_sol, enriched_bnb = await enrich_top_lists(top_sol, top_bnb)
+        except ChannelPrivateError:
+            logger.error(f"✗ کانال {channel_id}: دسترسی ممکن نیست (خصوصی یا بن شده)")
+            return None
+    return None
+
+async def fetch_all_sources(client, config, state, since, timeout: float | None = None) -> dict:
+    """
+    دریافت همزمان همه کانال‌های منبع با محدودیت FETCH_CONCURRENCY.
+    timeout: بودجه کل مرحله دریافت (ثانیه)؛ کانال‌هایی که به موقع تمام نشوند رد می‌شوند.
+
+    Returns:
+        dict: {channel_id: (messages, max_id)} فقط برای کانال‌های موفق
+    """
+    semaphore = asyncio.Semaphore(config['FETCH_CONCURRENCY'])
+    channels = list(config['SOURCE_CHANNELS'])
+    deadline_at = asyncio.get_running_loop().time() + timeout if timeout is not None else None
+    results = await asyncio.gather(*(
+        fetch_channel(client, config, channel_id, since, state.get_last_seen(channel_id), semaphore, deadline_at)
+        for channel_id in channels
+    ))
+    return {
+        channel_id: result
+        for channel_id, result in zip(channels, results)
+        if result is not None
+    }
+
+def collect_tokens(channel_messages: dict, weights: dict, dedup=None):
+    """
+    پارس پیام‌های همه کانال‌ها در یک عبور با اعمال وزن هر کانال؛ بلاک‌ها همراه با زمان پیام
+    هم برگردانده می‌شوند تا پس از انتشار موفق در پنجره‌های لغزان ثبت شوند.
+
+    Args:
+        channel_messages: {channel_id: messages}
+        weights: {channel_id: weight}
+        dedup: BlockDeduplicator اختیاری برای حذف بلاک‌های تکراری بین پیام‌ها و کانال‌ها
+
+    Returns:
+        tuple: ({chain: Counter}, blocks) - blocks لیستی از (chain, tokens, timestamp, weight)
+    """
+    counters = {chain: Counter() for chain in chain_keys()}
+    blocks = []
+    for channel_id, messages in channel_messages.items():
+        weight = weights.get(channel_id, 1.0)
+        for msg in messages:
+            timestamp = msg.date.timestamp()
+            for chain, block_tokens in iter_block_tokens((msg,), dedup):
+                counter = counters[chain]
+                for symbol in block_tokens:
+                    counter[symbol] += weight
+                blocks.append((chain, block_tokens, timestamp, weight))
+    return counters, blocks
+
+def log_dedup_stats(state, dedup):
+    """گزارش تعداد بلاک‌های تکراری حذف‌شده و ذخیره اثرانگشت‌ها برای چرخه‌های بعد"""
+    if dedup is None:
+        return
+    if dedup.checked:
+        logger.info(f"🧹 {dedup.dropped} بلاک تکراری از {dedup.checked} بلاک حذف شد")
+    dedup.reset_counters()
+    state.set("block_fingerprints", dedup.export())
+    state.save()
+
+async def publish_window_rankings(client, config, trend_windows):
+    """
+    لاگ (و در صورت فعال بودن، انتشار) رتبه‌بندی همه افق‌های زمانی.
+    این خلاصه اختیاری است و پس از ثبت وضعیت چرخه اجرا می‌شود، پس خطای ارسال آن
+    همین‌جا گرفته می‌شود و چرخه را ناموفق نمی‌کند.
+    """
+    rankings = trend_windows.top_all(k=5)
+    for chain, by_window in rankings.items():
+        for window, top in by_window.items():
+            logger.info(f"📈 {chain} {window}m: {', '.join(symbol for symbol, _ in top) or '-'}")
+    
+    if not config['PUBLISH_MULTI_WINDOW']:
+        return
+    try:
+        for chain, by_window in rankings.items():
+            message = format_multi_window_message(by_window, chain)
+            if message:
+                await client.send_message(config['DEST_CHANNEL_ID'], message, parse_mode="md")
+                await asyncio.sleep(0.5)
+    except FloodWaitError as e:
+        FLOOD_WAITS.inc(where="multi_window")
+        logger.warning(f"⚠ ارسال خلاصه چند افقی به دلیل FloodWait ({e.seconds} ثانیه) رد شد")
+    except Exception as e:
+        logger.warning(f"⚠ ارسال خلاصه چند افقی ناموفق بود: {e}")
+
+async def fill_missing_addresses(publisher, published: dict, completion):
+    """
+    پس از تکمیل جستجوهای دیررس، گزارش‌های منتشرشده با آدرس‌های جدید ویرایش می‌شوند
+    (مگر اینکه چرخه بعدی زودتر گزارش تازه‌ای منتشر کرده باشد).
+    """
+    try:
+        enriched = await completion
+    except Exception as e:
+        logger.warning(f"⚠ تکمیل آدرس‌های دیررس ناموفق بود: {e}")
+        return
+    for chain, message in format_output_message(enriched).items():
+        previous = published.get(chain)
+        if not previous or message == previous:
+            continue
+        try:
+            action = await publisher.revise(chain, previous, message)
+        except Exception as e:
+            logger.warning(f"⚠ ویرایش گزارش {chain} با آدرس‌های دیررس ناموفق بود: {e}")
+            continue
+        if action == EDITED:
+            logger.info(f"✎ آدرس‌های دیررس گزارش {chain} تکمیل شد")
+
+async def publish_trends(client, config, http_client, publisher, counters, trend_windows=None, deadline=None):
+    """
+    تحلیل، غنی‌سازی و انتشار گزارش (مشترک بین حالت poll و stream).
+    خطاهای تلگرام به فراخواننده (run_guarded) سپرده می‌شوند.
+
+    Args:
+        counters: {chain: Counter} شمارش‌شده به ترتیب ENABLED_CHAINS
+        trend_windows: SlidingWindowAnalyzer برای حالت ANALYZER_MODE=velocity (تاریخچه دوره‌ها)
+        deadline: CycleDeadline چرخه؛ اگر بودجه غنی‌سازی تمام شود گزارش با آدرس‌های آماده
+            منتشر و آدرس‌های باقی‌مانده بعداً با ویرایش پیام اضافه می‌شوند
+    """
+    total_tokens = sum(sum(counter.values()) for counter in counters.values())
+    
+    if total_tokens == 0:
+        logger.warning("⚠ هیچ توکنی شناسایی نشد")
+        await notify_admin(client, "ℹ️ هیچ توکنی در پیام‌ها شناسایی نشد.", config)
+        return
+    
+    logger.info(f"✓ {total_tokens:g} توکن برای تحلیل آماده است")
+    
+    with STAGE_SECONDS.time(stage="analyze"):
+        if config['ANALYZER_MODE'] == 'velocity' and trend_windows is not None:
+            period = (
+                config['PUBLISH_INTERVAL_SECONDS'] if config['SCAN_MODE'] == 'stream'
+                else config['LOOP_INTERVAL_SECONDS']
+            )
+            tops = analyze_velocity(counters, trend_windows, period)
+            logger.info("✓ تحلیل سرعت ترند انجام شد")
+        else:
+            tops = analyze_frequency(counters)
+            logger.info(f"✓ تحلیل فرکانس انجام شد")
+    
+    logger.info("→ در حال واکشی آدرس قراردادها...")
+    enrich_budget = deadline.budget("enrich") if deadline is not None else None
+    with STAGE_SECONDS.time(stage="enrich"):
+        enriched, completion = await enrich_within(tops, http_client, enrich_budget)
+    if completion is None:
         logger.info("✓ غنی‌سازی داده‌ها تکمیل شد")
-        
-        # بازنویسی برای ارسال دو پیام جداگانه
-        sol_message, bnb_message = format_output_message(enriched_sol, enriched_bnb)
-        
-        if not sol_message and not bnb_message:
+    else:
+        DEADLINE_EXCEEDED.inc(stage="enrich")
+        logger.warning(f"⚠ بودجه غنی‌سازی ({enrich_budget:.1f} ثانیه) تمام شد؛ گزارش با آدرس‌های آماده منتشر می‌شود")
+    
+    # یک پیام جداگانه برای هر زنجیره
+    messages = format_output_message(enriched)
+    
+    try:
+        if not any(messages.values()):
             logger.warning("⚠ پیام خروجی خالی است (داده‌ای برای نمایش نبود)")
             await notify_admin(client, "ℹ️ داده‌ای برای ساخت گزارش نهایی یافت نشد.", config)
+            if completion is not None:
+                completion.cancel()
             return
         
-        # ارسال پیام اول (SOL)
-        if sol_message:
-            await client.send_message(
-                config['DEST_CHANNEL_ID'],
-                sol_message,
-                parse_mode="md"
-            )
-            logger.info("✓ گزارش SOL ارسال شد")
-            await asyncio.sleep(0.5)  # تاخیر کوتاه بین دو پیام
-        
-        # ارسال پیام دوم (BNB)
-        if bnb_message:
-            await client.send_message(
-                config['DEST_CHANNEL_ID'],
-                bnb_message,
-                parse_mode="md"
-            )
-            logger.info("✓ گزارش BNB ارسال شد")
+        publish_started = time.perf_counter()
+        changed = False
+        for chain, message in messages.items():
+            if not message:
+                continue
+            if changed:
+                await asyncio.sleep(0.5)  # تاخیر کوتاه بین پیام‌ها
+            # در حالت edit گزارش بدون تغییر ارسال نمی‌شود و تغییرات با ویرایش پیام قبلی اعمال می‌شوند
+            action = await publisher.publish(chain, message)
+            if action == POSTED:
+                logger.info(f"✓ گزارش {chain} ارسال شد")
+            elif action == EDITED:
+                logger.info(f"✎ گزارش {chain} ویرایش شد")
+            else:
+                logger.info(f"= گزارش {chain} تغییری نکرده است؛ ارسال نشد")
+            changed = changed or action != UNCHANGED
+        STAGE_SECONDS.observe(time.perf_counter() - publish_started, stage="publish")
+    except BaseException:
+        if completion is not None:
+            completion.cancel()
+        raise
+    
+    if completion is not None:
+        task = asyncio.create_task(fill_missing_addresses(publisher, messages, completion))
+        # نگه داشتن ارجاع تا Task پیش از اتمام جمع‌آوری نشود
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
 
+    if changed:
         await notify_admin(client, "✅ گزارش(ها) با موفقیت ارسال شد.", config)
+    else:
+        await notify_admin(client, "ℹ️ رتبه‌بندی تغییری نکرده بود؛ پیامی ارسال نشد.", config)
+
+def new_cycle_deadline(config) -> CycleDeadline:
+    """مهلت چرخه جاری با بودجه مراحل از تنظیمات"""
+    return CycleDeadline(
+        config['CYCLE_DEADLINE_SECONDS'],
+        {'fetch': config['FETCH_BUDGET_SECONDS'], 'enrich': config['ENRICH_BUDGET_SECONDS']},
+    )
+
+async def run_guarded(client, config, cycle, deadline=None):
+    """اجرای یک چرخه با مدیریت خطاهای تلگرام و خطاهای غیرمنتظره"""
+    try:
+        await cycle
+        if deadline is not None and deadline.expired():
+            DEADLINE_EXCEEDED.inc(stage="cycle")
+            logger.warning(
+                f"⚠ چرخه {deadline.elapsed():.0f} ثانیه طول کشید "
+                f"(مهلت: {config['CYCLE_DEADLINE_SECONDS']:.0f} ثانیه)"
+            )
         
     except FloodWaitError as e:
+        FLOOD_WAITS.inc(where="cycle")
         logger.error(f"✗ محدودیت تلگرام: باید {e.seconds} ثانیه صبر کنید")
         await notify_admin(client, f"⏳ محدودیت تلگرام: {e.seconds} ثانیه صبر.", config)
         await asyncio.sleep(e.seconds)
@@ -175,6 +529,163 @@ async def process_trends(client, config):
         logger.error(f"✗ خطای غیرمنتظره: {e}", exc_info=True)
         await notify_admin(client, f"🆘 خطای غیرمنتظره:\n`{str(e)}`", config)
 
+def record_history(history, timestamp, counters):
+    """ثبت شمارش‌های چرخه در تاریخچه بلندمدت (خطای دیسک چرخه را متوقف نمی‌کند)"""
+    if history is None:
+        return
+    try:
+        for chain, counter in counters.items():
+            history.append(timestamp, chain, counter)
+    except OSError as e:
+        logger.warning(f"⚠ ثبت تاریخچه ناموفق بود: {e}")
+
+async def process_trends(client, config, http_client, publisher, state, trend_windows, dedup, history):
+    """پردازش اصلی (حالت poll): دریافت، تحلیل و انتشار ترندها"""
+    deadline = new_cycle_deadline(config)
+    
+    async def cycle():
+        now = datetime.now(UTC)
+        since = now - timedelta(seconds=config['LOOP_INTERVAL_SECONDS'])
+        
+        logger.info(
+            f"→ شروع اسکن {len(config['SOURCE_CHANNELS'])} کانال از {since.strftime('%H:%M:%S')}"
+        )
+        await notify_admin(client, "🔍 چرخه اسکن جدید آغاز شد...", config)
+        
+        with STAGE_SECONDS.time(stage="fetch"):
+            fetched = await fetch_all_sources(client, config, state, since, deadline.budget("fetch"))
+        channel_messages = {channel_id: result[0] for channel_id, result in fetched.items()}
+        total_messages = sum(len(messages) for messages in channel_messages.values())
+        
+        def commit_last_seen():
+            # شناسه فقط پس از انتشار موفق جلو می‌رود تا در صورت خطا پیام‌ها در چرخه بعد دوباره خوانده شوند
+            for channel_id, (_, max_id) in fetched.items():
+                state.set_last_seen(channel_id, max_id)
+        
+        if not total_messages:
+            commit_last_seen()
+            logger.warning("⚠ هیچ پیامی در این بازه زمانی یافت نشد")
+            await notify_admin(client, "ℹ️ هیچ پیام جدیدی یافت نشد.", config)
+            return
+        
+        logger.info(f"✓ {total_messages} پیام از {len(fetched)} کانال دریافت شد")
+        
+        with STAGE_SECONDS.time(stage="parse"):
+            counters, blocks = collect_tokens(channel_messages, config['SOURCE_CHANNELS'], dedup)
+        summary = " و ".join(f"{sum(counter.values()):g} توکن {chain}" for chain, counter in counters.items())
+        logger.info(f"✓ {summary} (وزن‌دار) استخراج شد")
+        
+        try:
+            await publish_trends(client, config, http_client, publisher, counters, trend_windows, deadline)
+        except BaseException:
+            # پیام‌ها در چرخه بعد دوباره خوانده می‌شوند و نباید تکراری شناخته شوند
+            if dedup is not None:
+                dedup.rollback()
+            raise
+        if dedup is not None:
+            dedup.commit()
+        log_dedup_stats(state, dedup)
+        
+        # ثبت در پنجره‌ها پس از انتشار موفق تا خواندن دوباره پیام‌ها در چرخه بعد دوبار شمرده نشود
+        for chain, block_tokens, timestamp, weight in blocks:
+            trend_windows.add(chain, block_tokens, timestamp, weight)
+        record_history(history, now.timestamp(), counters)
+        commit_last_seen()
+        CYCLES.inc(mode="poll")
+        
+        # همه وضعیت چرخه پیش از این ارسال اختیاری ثبت شده است
+        await publish_window_rankings(client, config, trend_windows)
+    
+    await run_guarded(client, config, cycle(), deadline)
+
+def register_stream_handlers(client, config, collector):
+    """ثبت هندلرهای NewMessage و MessageEdited روی همه کانال‌های منبع برای حالت استریم"""
+    weights = config['SOURCE_CHANNELS']
+    
+    async def on_message(event):
+        try:
+            collector.add(event.message, weights.get(event.chat_id, 1.0))
+        except Exception as e:
+            logger.error(f"✗ خطا در پردازش پیام استریم: {e}", exc_info=True)
+    
+    sources = list(weights)
+    client.add_event_handler(on_message, events.NewMessage(chats=sources))
+    client.add_event_handler(on_message, events.MessageEdited(chats=sources))
+    logger.info(f"✓ هندلرهای استریم روی {len(sources)} کانال منبع ثبت شدند")
+
+def register_health_alerts(client, config):
+    """اطلاع‌رسانی تغییر وضعیت Circuit Breaker هر Provider به ادمین"""
+    pending = set()
+    labels = {
+        health.OPEN: "🔴 Provider `{}` از دسترس خارج شد و موقتاً کنار گذاشته شد.",
+        health.CLOSED: "🟢 Provider `{}` دوباره در دسترس است.",
+    }
+    
+    def on_change(provider, old_state, new_state):
+        # آزمایش‌های half-open ناموفق در طول قطعی هر Cooldown تکرار می‌شوند و گزارش نمی‌شوند
+        if new_state == health.HALF_OPEN or old_state == health.HALF_OPEN and new_state == health.OPEN:
+            return
+        task = asyncio.get_running_loop().create_task(
+            notify_admin(client, labels[new_state].format(provider), config)
+        )
+        # نگه داشتن ارجاع تا Task پیش از اتمام جمع‌آوری نشود
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    
+    health.add_listener(on_change)
+
+async def catch_up_stream(client, config, state, collector):
+    """پیام‌های بین آخرین اجرا و شروع استریم یک بار خوانده و به شمارنده‌ها اضافه می‌شوند."""
+    since = datetime.now(UTC) - timedelta(seconds=config['PUBLISH_INTERVAL_SECONDS'])
+    fetched = await fetch_all_sources(client, config, state, since)
+    total = 0
+    for channel_id, (messages, _) in fetched.items():
+        weight = config['SOURCE_CHANNELS'].get(channel_id, 1.0)
+        for msg in reversed(messages):
+            collector.add(msg, weight)
+        total += len(messages)
+    logger.info(f"✓ {total} پیام قبلی در حالت استریم بازخوانی شد")
+
+async def process_stream(client, config, http_client, publisher, state, collector, trend_windows, dedup, history):
+    """انتشار زمان‌بندی‌شده در حالت استریم (پیام‌ها قبلاً توسط هندلرها پارس شده‌اند)"""
+    deadline = new_cycle_deadline(config)
+    
+    async def cycle():
+        counters, message_keys = collector.snapshot()
+        
+        if not message_keys:
+            logger.warning("⚠ از آخرین انتشار هیچ پیام Heatmap جدیدی دریافت نشد")
+            await notify_admin(client, "ℹ️ هیچ پیام جدیدی یافت نشد.", config)
+            return
+        
+        logger.info(f"→ انتشار گزارش استریم از {len(message_keys)} پیام")
+        await publish_trends(client, config, http_client, publisher, counters, trend_windows, deadline)
+        
+        collector.commit(message_keys)
+        record_history(history, time.time(), counters)
+        log_dedup_stats(state, dedup)
+        for channel_id, message_id in collector.last_published_ids.items():
+            state.set_last_seen(channel_id, message_id)
+        CYCLES.inc(mode="stream")
+        
+        # همه وضعیت چرخه پیش از این ارسال اختیاری ثبت شده است
+        await publish_window_rankings(client, config, trend_windows)
+    
+    await run_guarded(client, config, cycle(), deadline)
+
+async def sleep_until_next_tick(scheduler: TickScheduler):
+    """انتظار تا تیک بعدی ساعت دیواری به جای sleep ثابت پس از هر چرخه"""
+    now = time.time()
+    tick, skipped = scheduler.advance(now)
+    if skipped:
+        SKIPPED_TICKS.inc(skipped)
+        logger.warning(f"⚠ چرخه قبلی طولانی بود؛ {skipped} نوبت زمان‌بندی رد شد")
+    logger.info(
+        f"💤 چرخه بعدی در {datetime.fromtimestamp(tick, UTC).strftime('%H:%M:%S')} UTC "
+        f"({tick - now:.0f} ثانیه دیگر)...\n"
+    )
+    await asyncio.sleep(tick - now)
+
 async def main():
     """حلقه اصلی برنامه"""
     setup_logging()
@@ -185,19 +696,68 @@ async def main():
         config['API_ID'],
         config['API_HASH']
     )
+    state = StateStore(config['STATE_PATH'])
+    publisher = ReportPublisher(
+        client,
+        config['DEST_CHANNEL_ID'],
+        state,
+        config['PUBLISH_MODE'],
+        config['REPOST_INTERVAL_SECONDS']
+    )
+    trend_windows = SlidingWindowAnalyzer(config['TREND_WINDOWS'])
+    dedup = BlockDeduplicator() if DEDUP_ENABLED else None
+    if dedup is not None:
+        dedup.load(state.get("block_fingerprints"))
+        if config['SCAN_MODE'] == 'poll' and dedup.ttl < 2 * config['LOOP_INTERVAL_SECONDS']:
+            logger.warning(
+                f"⚠ DEDUP_TTL_SECONDS={dedup.ttl} کمتر از دو برابر LOOP_INTERVAL_SECONDS است؛ "
+                "ریپست‌های چرخه بعد ممکن است دوباره شمرده شوند"
+            )
+    # تاریخچه بلندمدت شمارش‌ها برای پرسش‌های چندروزه بدون دریافت دوباره از تلگرام
+    history = None
+    if HISTORY_ENABLED:
+        try:
+            history = HistoryStore()
+        except HistoryLockedError as e:
+            # مثلاً backfill روی همین پوشه در حال اجراست؛ ربات بدون ثبت تاریخچه ادامه می‌دهد
+            logger.error(f"✗ تاریخچه در این اجرا غیرفعال شد: {e}")
+    # کلاینت HTTP مشترک برای کل طول عمر برنامه (Connection Pool و Keep-Alive)
+    http_client = create_http_client()
+    metrics_server = None
+    snapshot_task = None
+    register_health_alerts(client, config)
     
     try:
+        # endpoint متریک‌ها (METRICS_PORT) و Snapshot JSON (METRICS_SNAPSHOT_PATH) در صورت تنظیم
+        metrics_server = await metrics.start_metrics_server()
+        snapshot_task = asyncio.create_task(metrics.run_snapshot_writer())
+        
         await client.start()
         logger.info("=" * 50)
         logger.info("🤖 ربات اسکنر ترند تلگرام فعال شد")
-        logger.info(f"⏱ بازه زمانی اسکن: هر {config['LOOP_INTERVAL_SECONDS']} ثانیه")
+        logger.info(f"⏱ بازه زمانی اسکن: هر {config['LOOP_INTERVAL_SECONDS']} ثانیه (حالت: {config['SCAN_MODE']})")
         logger.info("=" * 50)
         await notify_admin(client, "🤖 **ربات اسکنر ترند فعال شد**", config)
         
+        if config['SCAN_MODE'] == 'stream':
+            collector = StreamCollector(
+                {channel_id: state.get_last_seen(channel_id) for channel_id in config['SOURCE_CHANNELS']},
+                trend_windows,
+                dedup
+            )
+            register_stream_handlers(client, config, collector)
+            await run_guarded(client, config, catch_up_stream(client, config, state, collector))
+            
+            # در حالت استریم هنگام شروع چرخه‌ای اجرا نمی‌شود، پس اولین تیک نباید رد شود
+            scheduler = TickScheduler(config['PUBLISH_INTERVAL_SECONDS'], min_first_gap=0)
+            while True:
+                await sleep_until_next_tick(scheduler)
+                await process_stream(client, config, http_client, publisher, state, collector, trend_windows, dedup, history)
+        
+        scheduler = TickScheduler(config['LOOP_INTERVAL_SECONDS'])
         while True:
-            await process_trends(client, config)
-            logger.info(f"💤 در حالت انتظار برای {config['LOOP_INTERVAL_SECONDS']} ثانیه...\n")
-            await asyncio.sleep(config['LOOP_INTERVAL_SECONDS'])
+            await process_trends(client, config, http_client, publisher, state, trend_windows, dedup, history)
+            await sleep_until_next_tick(scheduler)
     
     except KeyboardInterrupt:
         logger.info("\n⏹ دریافت سیگنال توقف...")
@@ -210,6 +770,16 @@ async def main():
         if client.is_connected():
             await notify_admin(client, "👋 ربات در حال خاموش شدن...", config)
             await client.disconnect()
+        await http_client.aclose()
+        close_address_cache()
+        if history is not None:
+            history.close()
+        if snapshot_task is not None:
+            snapshot_task.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+        if metrics.METRICS_SNAPSHOT_PATH:
+            metrics.write_json_snapshot(metrics.METRICS_SNAPSHOT_PATH)
         logger.info("👋 ربات با موفقیت خاموش شد")
 
 if __name__ == "__main__":
@@ -3,31 +3,211 @@
 """
 
 from collections import Counter
+import time
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
-def analyze_frequency(sol_tokens: list, bnb_tokens: list) -> tuple[list, list]:
+def analyze_frequency(tokens_by_chain: dict, k: int = 5) -> dict:
     """
-    دو لیست خام از توکن‌ها را گرفته و لیست تاپ ۵ پرتکرار هر کدام را برمی‌گرداند.
+    توکن‌های خام هر زنجیره را گرفته و لیست تاپ k پرتکرار هر کدام را برمی‌گرداند.
     
     Args:
-        sol_tokens: لیست نمادهای توکن سولانا
-        bnb_tokens: لیست نمادهای توکن بایننس
+        tokens_by_chain: {chain: لیست نمادهای توکن} (یا Counter از قبل شمارش‌شده در حالت استریم)
+        k: تعداد توکن‌های برتر هر زنجیره
         
     Returns:
-        tuple: (top_sol, top_bnb) - دو لیست از (symbol, count)
+        dict: {chain: لیست (symbol, count)} با همان ترتیب زنجیره‌های ورودی
     """
-    # شمارش فرکانس توکن‌ها
-    sol_counter = Counter(sol_tokens)
-    bnb_counter = Counter(bnb_tokens)
+    # شمارش فرکانس و استخراج k توکن برتر
+    tops = {chain: Counter(tokens).most_common(k) for chain, tokens in tokens_by_chain.items()}
     
-    # استخراج ۵ توکن برتر
-    top_sol = sol_counter.most_common(5)
-    top_bnb = bnb_counter.most_common(5)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Analyzer: %s", ", ".join(f"Top {chain}={len(top)}" for chain, top in tops.items()))
     
-    logger.debug(
-        f"Analyzer: Top SOL={len(top_sol)}, Top BNB={len(top_bnb)}"
-    )
-    
-    return top_sol, top_bnb
+    return tops
+
+
+def columns_to_matrix(columns, width: int) -> tuple[list, np.ndarray]:
+    """
+    ساخت ماتریس (نماد × ستون) از جفت‌های (col, Counter)؛ شمارش‌های یک ستون تکراری جمع می‌شوند.
+    مشترک بین SlidingWindowAnalyzer.bucket_matrix و velocity.counters_to_matrix.
+    """
+    index = {}
+    rows, cols, values = [], [], []
+    for col, counts in columns:
+        for symbol, count in counts.items():
+            rows.append(index.setdefault(symbol, len(index)))
+            cols.append(col)
+            values.append(count)
+    # bincount روی اندیس تخت (row * width + col) سریع‌تر از np.add.at است
+    flat = np.asarray(rows, dtype=np.intp) * width + np.asarray(cols, dtype=np.intp)
+    matrix = np.bincount(flat, weights=np.asarray(values, dtype=float), minlength=len(index) * width)
+    return list(index), matrix.reshape(len(index), width)
+
+
+class SlidingWindowAnalyzer:
+    """
+    تحلیلگر جریانی با پنجره‌های زمانی لغزان (مثلاً ۳۰ دقیقه، ۱، ۶ و ۲۴ ساعت).
+
+    برای هر زنجیره یک بافر حلقوی از باکت‌های زمانی (پیش‌فرض یک دقیقه‌ای) نگه‌داری می‌شود.
+    مجموع هر پنجره هنگام درج و انقضای باکت‌ها به صورت افزایشی به‌روز می‌شود، پس
+    پاسخ به top-k هیچ بازشماری از تاریخچه لازم ندارد.
+    """
+
+    def __init__(self, windows_minutes=(30, 60, 360, 1440), bucket_seconds: int = 60):
+        if not windows_minutes:
+            raise ValueError("حداقل یک پنجره زمانی لازم است")
+        self.bucket_seconds = bucket_seconds
+        self.windows = sorted({int(w) for w in windows_minutes})
+        self._window_buckets = {
+            w: max(1, (w * 60) // bucket_seconds) for w in self.windows
+        }
+        self.size = max(self._window_buckets.values())
+        self._chains = {}
+
+    def _chain_state(self, chain: str) -> dict:
+        state = self._chains.get(chain)
+        if state is None:
+            state = {
+                "head": None,                          # شماره آخرین باکت فعال
+                "buckets": [None] * self.size,         # بافر حلقوی Counter ها
+                "bucket_ids": [-1] * self.size,        # شماره مطلق باکت هر خانه
+                "totals": {w: Counter() for w in self.windows},
+            }
+            self._chains[chain] = state
+        return state
+
+    def _bucket_index(self, timestamp: float | None) -> int:
+        if timestamp is None:
+            timestamp = time.time()
+        return int(timestamp // self.bucket_seconds)
+
+    @staticmethod
+    def _apply(total: Counter, counts: Counter, sign: int):
+        for symbol, count in counts.items():
+            value = total[symbol] + sign * count
+            if value > 0:
+                total[symbol] = value
+            else:
+                del total[symbol]
+
+    def _advance(self, state: dict, new_head: int):
+        head = state["head"]
+        if head is None:
+            state["head"] = new_head
+            return
+        if new_head <= head:
+            return
+
+        buckets, bucket_ids = state["buckets"], state["bucket_ids"]
+
+        if new_head - head >= self.size:
+            # کل بافر منقضی شده است
+            state["buckets"] = [None] * self.size
+            state["bucket_ids"] = [-1] * self.size
+            state["totals"] = {w: Counter() for w in self.windows}
+            state["head"] = new_head
+            return
+
+        # باکت‌هایی که از هر پنجره خارج می‌شوند از مجموع همان پنجره کم می‌شوند
+        for window, total in state["totals"].items():
+            span = self._window_buckets[window]
+            for idx in range(head - span + 1, new_head - span + 1):
+                slot = idx % self.size
+                if bucket_ids[slot] == idx and buckets[slot]:
+                    self._apply(total, buckets[slot], -1)
+
+        for idx in range(head + 1, new_head + 1):
+            slot = idx % self.size
+            buckets[slot] = None
+            bucket_ids[slot] = -1
+
+        state["head"] = new_head
+
+    def _update(self, chain: str, tokens, timestamp: float | None, sign: int, weight: float = 1):
+        counts = tokens if isinstance(tokens, Counter) else Counter(tokens)
+        if weight != 1:
+            counts = Counter({symbol: count * weight for symbol, count in counts.items()})
+        if not counts:
+            return
+
+        state = self._chain_state(chain)
+        idx = self._bucket_index(timestamp)
+        self._advance(state, idx)
+
+        head = state["head"]
+        if idx <= head - self.size:
+            logger.debug("SlidingWindow: dropped stale bucket for %s", chain)
+            return
+
+        slot = idx % self.size
+        if state["bucket_ids"][slot] != idx:
+            state["buckets"][slot] = Counter()
+            state["bucket_ids"][slot] = idx
+        self._apply(state["buckets"][slot], counts, sign)
+
+        for window, total in state["totals"].items():
+            if idx > head - self._window_buckets[window]:
+                self._apply(total, counts, sign)
+
+    def add(self, chain: str, tokens, timestamp: float | None = None, weight: float = 1):
+        """افزودن توکن‌ها (لیست یا Counter) به باکت زمان timestamp (ثانیه epoch)"""
+        self._update(chain, tokens, timestamp, +1, weight)
+
+    def remove(self, chain: str, tokens, timestamp: float | None = None, weight: float = 1):
+        """حذف سهم قبلی (مثلاً هنگام ویرایش پیام)"""
+        self._update(chain, tokens, timestamp, -1, weight)
+
+    def top(self, chain: str, window: int, k: int = 5, now: float | None = None) -> list:
+        """
+        تاپ k توکن یک زنجیره در پنجره window (دقیقه).
+
+        Returns:
+            list: لیست (symbol, count)
+        """
+        if window not in self._window_buckets:
+            raise ValueError(f"پنجره {window} دقیقه‌ای تعریف نشده است: {self.windows}")
+        state = self._chains.get(chain)
+        if state is None:
+            return []
+        self._advance(state, self._bucket_index(now))
+        return state["totals"][window].most_common(k)
+
+    def top_all(self, k: int = 5, now: float | None = None) -> dict:
+        """رتبه‌بندی همه زنجیره‌ها در همه پنجره‌ها: {chain: {window: [(symbol, count), ...]}}"""
+        return {
+            chain: {window: self.top(chain, window, k, now) for window in self.windows}
+            for chain in self._chains
+        }
+
+    def history_periods(self, period_seconds: int) -> int:
+        """تعداد دوره‌های کامل period_seconds که بافر حلقوی پوشش می‌دهد"""
+        return (self.size * self.bucket_seconds) // period_seconds
+
+    def bucket_matrix(self, chain: str, period_seconds: int, periods: int, end: float | None = None):
+        """
+        ماتریس شمارش نمادها در دوره‌های متوالی (برای امتیازدهی برداری).
+        ستون j بازه [end - (periods - j) * period, end - (periods - j - 1) * period) را پوشش می‌دهد
+        (قدیمی‌ترین ستون اول).
+
+        Returns:
+            tuple: (symbols, matrix) - ماتریس numpy با شکل (len(symbols), periods)
+        """
+        state = self._chains.get(chain)
+        if state is None or periods <= 0:
+            return [], np.zeros((0, max(periods, 0)))
+        end = time.time() if end is None else end
+        self._advance(state, self._bucket_index(end))
+        start = end - periods * period_seconds
+
+        def columns():
+            for bucket_id, counts in zip(state["bucket_ids"], state["buckets"]):
+                if bucket_id < 0 or not counts:
+                    continue
+                col = int((bucket_id * self.bucket_seconds - start) // period_seconds)
+                if 0 <= col < periods:
+                    yield col, counts
+
+        return columns_to_matrix(columns(), periods)
@@ -0,0 +1,188 @@
+"""
+ماژول کش آدرس قراردادها (نماد + شبکه -> آدرس)
+- لایه اول: LRU محدود در حافظه
+- لایه دوم: SQLite روی دیسک که بعد از ری‌استارت باقی می‌ماند
+- TTL جداگانه برای نتایج موفق و نتایج «یافت نشد» (Negative Caching)
+- نوشتن‌های SQLite تا flush() در حافظه جمع می‌شوند تا هر اجرای غنی‌سازی فقط یک commit
+  (یک fsync) روی حلقه asyncio داشته باشد
+"""
+
+import os
+import time
+import sqlite3
+import logging
+from collections import OrderedDict
+
+from modules.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# --- تنظیمات کش ---
+ADDRESS_CACHE_ENABLED = os.getenv("ADDRESS_CACHE_ENABLED", "1") != "0"
+ADDRESS_CACHE_PATH = os.getenv("ADDRESS_CACHE_PATH", "address_cache.sqlite3")
+ADDRESS_CACHE_MAX_ENTRIES = int(os.getenv("ADDRESS_CACHE_MAX_ENTRIES", 2048))
+ADDRESS_CACHE_TTL_SECONDS = int(os.getenv("ADDRESS_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+ADDRESS_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("ADDRESS_CACHE_NEGATIVE_TTL_SECONDS", 3600))
+
+# مقدار نگهبان برای تفکیک «در کش نیست» از «در کش به عنوان یافت نشد ثبت شده»
+MISS = object()
+
+
+class AddressCache:
+    """کش دو لایه (LRU + SQLite) برای آدرس قراردادها با کلید (symbol, network)"""
+
+    def __init__(
+        self,
+        path: str = ADDRESS_CACHE_PATH,
+        max_entries: int = ADDRESS_CACHE_MAX_ENTRIES,
+        ttl: int = ADDRESS_CACHE_TTL_SECONDS,
+        negative_ttl: int = ADDRESS_CACHE_NEGATIVE_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._lru = OrderedDict()  # (symbol, network) -> (address, expires_at)
+        self._pending = {}  # نوشتن‌های ثبت‌نشده در SQLite: (symbol, network) -> (address, expires_at)
+        self._db = None
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+        if path:
+            try:
+                self._db = sqlite3.connect(path)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS addresses ("
+                    " symbol TEXT NOT NULL,"
+                    " network TEXT NOT NULL,"
+                    " address TEXT NOT NULL,"
+                    " expires_at REAL NOT NULL,"
+                    " PRIMARY KEY (symbol, network))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"AddressCache: SQLite disabled ({path}): {e}")
+                self._db = None
+
+    def get(self, symbol: str, network: str):
+        """
+        آدرس کش‌شده را برمی‌گرداند.
+
+        Returns:
+            آدرس (str)، رشته خالی برای «یافت نشد» یا MISS اگر ورودی معتبری وجود نداشته باشد
+        """
+        key = (symbol, network)
+        now = time.time()
+
+        entry = self._lru.get(key)
+        if entry is None and key in self._pending:
+            entry = self._pending[key]
+            self._remember(key, entry)
+        if entry is None and self._db is not None:
+            try:
+                row = self._db.execute(
+                    "SELECT address, expires_at FROM addresses WHERE symbol = ? AND network = ?",
+                    key,
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"AddressCache: read failed for {symbol}-{network}: {e}")
+                row = None
+            if row is not None:
+                entry = (row[0], row[1])
+                self._remember(key, entry)
+
+        if entry is None or entry[1] <= now:
+            if entry is not None:
+                self._lru.pop(key, None)
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result="miss")
+            return MISS
+
+        self._lru.move_to_end(key)
+        if entry[0]:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(result="hit")
+        else:
+            self.negative_hits += 1
+            CACHE_LOOKUPS.inc(result="negative_hit")
+        return entry[0]
+
+    def set(self, symbol: str, network: str, address: str):
+        """ثبت نتیجه؛ رشته خالی به عنوان «یافت نشد» با TTL کوتاه‌تر ذخیره می‌شود."""
+        key = (symbol, network)
+        ttl = self.ttl if address else self.negative_ttl
+        entry = (address, time.time() + ttl)
+        self._remember(key, entry)
+        if self._db is not None:
+            self._pending[key] = entry
+
+    def flush(self) -> int:
+        """ثبت نوشتن‌های جمع‌شده در SQLite با یک تراکنش؛ تعداد ردیف‌های نوشته‌شده را برمی‌گرداند."""
+        if self._db is None or not self._pending:
+            return 0
+        rows = [(symbol, network, address, expires_at)
+                for (symbol, network), (address, expires_at) in self._pending.items()]
+        self._pending.clear()
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO addresses (symbol, network, address, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"AddressCache: write failed for {len(rows)} entries: {e}")
+            return 0
+        return len(rows)
+
+    def _remember(self, key, entry):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "size": len(self._lru),
+        }
+
+    def purge_expired(self):
+        """حذف ورودی‌های منقضی از SQLite تا فایل کش بی‌رویه بزرگ نشود."""
+        if self._db is None:
+            return
+        try:
+            self._db.execute("DELETE FROM addresses WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"AddressCache: purge failed: {e}")
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+_address_cache = None
+
+
+def get_address_cache():
+    """نمونه مشترک کش را (در صورت فعال بودن) برمی‌گرداند."""
+    global _address_cache
+    if not ADDRESS_CACHE_ENABLED:
+        return None
+    if _address_cache is None:
+        _address_cache = AddressCache()
+        _address_cache.purge_expired()
+    return _address_cache
+
+
+def close_address_cache():
+    global _address_cache
+    if _address_cache is not None:
+        _address_cache.close()
+        _address_cache = None
@@ -0,0 +1,69 @@
+"""
+ماژول تعریف زنجیره‌ها (Chain Registry)
+- تنها محل تعریف هر زنجیره: برچسب Heatmap، شناسه شبکه در APIها و هدر پیام خروجی
+- زنجیره‌های فعال و ترتیب انتشار از ENABLED_CHAINS در .env خوانده می‌شوند (پیش‌فرض: SOL,BNB)
+- پارسر، تحلیلگر، غنی‌ساز و فرمت‌دهنده همگی خروجی را به صورت {chain: ...} برمی‌گردانند
+"""
+
+import os
+from typing import NamedTuple
+
+
+class Chain(NamedTuple):
+    key: str  # نام زنجیره در «$KEY Heatmap» و کلید همه دیکشنری‌ها
+    network: str  # شناسه شبکه در Birdeye / chainId در Dexscreener
+    header: str  # عنوان پیام تاپ ۵
+    aliases: tuple = ()  # برچسب‌های جایگزین در متن Heatmap (مثلاً TRX برای TRON)
+
+
+CHAIN_REGISTRY = {
+    chain.key: chain
+    for chain in (
+        Chain("SOL", "solana", "🏆 **Top 5 Trending - $SOL** 🏆"),
+        Chain("BNB", "bsc", "🔥 **Top 5 Trending - $BNB** 🔥", ("BSC",)),
+        Chain("ETH", "ethereum", "💎 **Top 5 Trending - $ETH** 💎"),
+        Chain("BASE", "base", "🔵 **Top 5 Trending - $BASE** 🔵"),
+        Chain("TRON", "tron", "⚡ **Top 5 Trending - $TRON** ⚡", ("TRX",)),
+        Chain("ARB", "arbitrum", "🌀 **Top 5 Trending - $ARB** 🌀"),
+        Chain("SUI", "sui", "🌊 **Top 5 Trending - $SUI** 🌊"),
+    )
+}
+
+ENABLED_CHAINS = [
+    key.strip().upper() for key in os.getenv("ENABLED_CHAINS", "SOL,BNB").split(",") if key.strip()
+]
+
+
+def unknown_chains() -> list:
+    """کلیدهای ENABLED_CHAINS که در CHAIN_REGISTRY تعریف نشده‌اند (برای اعتبارسنجی تنظیمات)"""
+    return [key for key in ENABLED_CHAINS if key not in CHAIN_REGISTRY]
+
+
+def enabled_chains() -> list:
+    """زنجیره‌های فعال به ترتیب ENABLED_CHAINS (کلیدهای ناشناخته نادیده گرفته می‌شوند)"""
+    return [CHAIN_REGISTRY[key] for key in ENABLED_CHAINS if key in CHAIN_REGISTRY]
+
+
+def chain_keys() -> list:
+    return [chain.key for chain in enabled_chains()]
+
+
+def label_map(chains=None) -> dict:
+    """برچسب متن Heatmap (کلید یا نام مستعار) -> کلید زنجیره"""
+    labels = {}
+    for chain in chains if chains is not None else enabled_chains():
+        labels[chain.key] = chain.key
+        for alias in chain.aliases:
+            labels[alias] = chain.key
+    return labels
+
+
+def network_for(key: str) -> str:
+    """شناسه شبکه API برای کلید زنجیره (برای کلیدهای ثبت‌نشده همان نام با حروف کوچک)"""
+    chain = CHAIN_REGISTRY.get(key.upper())
+    return chain.network if chain is not None else key.lower()
+
+
+def header_for(key: str) -> str:
+    chain = CHAIN_REGISTRY.get(key.upper())
+    return chain.header if chain is not None else f"**Top 5 Trending - ${key.upper()}**"
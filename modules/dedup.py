@@ -0,0 +1,110 @@
+"""
+ماژول حذف بلاک‌های Heatmap تکراری (ریپست، فوروارد و ویرایش پیام)
+- اثرانگشت هر بلاک: هش blake2b از زنجیره + دنباله نرمال‌شده توکن‌ها
+- مجموعه اثرانگشت‌ها محدود و دارای انقضای زمانی است و بین چرخه‌ها ذخیره می‌شود
+- انقضا بر حسب زمان پیام حساب می‌شود و TTL پیش‌فرض دو برابر LOOP_INTERVAL_SECONDS است تا
+  ریپستی که در چرخه بعد برسد هم تکراری شناخته شود
+"""
+
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+
+from modules.metrics import DEDUP_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") != "0"
+DEDUP_TTL_SECONDS = int(os.getenv("DEDUP_TTL_SECONDS", 2 * int(os.getenv("LOOP_INTERVAL_SECONDS", 1800))))
+DEDUP_MAX_ENTRIES = int(os.getenv("DEDUP_MAX_ENTRIES", 20000))
+
+
+def block_fingerprint(chain: str, tokens: list) -> str:
+    """اثرانگشت ۶۴ بیتی بلاک؛ $ و # و حروف کوچک/بزرگ در مقایسه نادیده گرفته می‌شوند."""
+    normalized = "\x1e".join(t.lstrip("$#").upper() for t in tokens)
+    payload = f"{chain.upper()}\x1f{normalized}".encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+
+class BlockDeduplicator:
+    """مجموعه محدود و منقضی‌شونده اثرانگشت بلاک‌ها"""
+
+    def __init__(self, ttl: int = DEDUP_TTL_SECONDS, max_entries: int = DEDUP_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen = OrderedDict()  # fingerprint -> expires_at (به ترتیب درج)
+        self._pending = []  # اثرانگشت‌های ثبت‌شده از آخرین commit
+
+        self.checked = 0
+        self.dropped = 0
+
+    def _expire(self, now: float):
+        seen = self._seen
+        while seen:
+            fingerprint, expires_at = next(iter(seen.items()))
+            if expires_at > now and len(seen) <= self.max_entries:
+                break
+            seen.popitem(last=False)
+
+    def check(self, chain: str, tokens: list, now: float | None = None) -> tuple[bool, str]:
+        """
+        بررسی و ثبت یک بلاک.
+
+        Returns:
+            tuple: (is_duplicate, fingerprint)
+        """
+        now = time.time() if now is None else now
+        self._expire(now)
+        self.checked += 1
+
+        fingerprint = block_fingerprint(chain, tokens)
+        # زمان پیام‌ها لزوماً صعودی نیست، پس انقضای خود اثرانگشت هم بررسی می‌شود
+        expires_at = self._seen.get(fingerprint)
+        if expires_at is not None and expires_at > now:
+            self.dropped += 1
+            DEDUP_BLOCKS.inc(result="duplicate")
+            return True, fingerprint
+
+        self._seen.pop(fingerprint, None)
+        self._seen[fingerprint] = now + self.ttl
+        self._pending.append(fingerprint)
+        DEDUP_BLOCKS.inc(result="unique")
+        return False, fingerprint
+
+    def discard(self, fingerprints):
+        """حذف اثرانگشت‌ها (مثلاً وقتی پیام ویرایش شده یا انتشار چرخه شکست خورده است)"""
+        for fingerprint in fingerprints:
+            self._seen.pop(fingerprint, None)
+
+    def commit(self):
+        """تایید اثرانگشت‌های ثبت‌شده پس از انتشار موفق چرخه"""
+        self._pending = []
+
+    def rollback(self):
+        """لغو اثرانگشت‌های چرخه ناموفق تا پیام‌ها در تلاش بعدی تکراری حساب نشوند"""
+        self.discard(self._pending)
+        self._pending = []
+
+    def reset_counters(self):
+        self.checked = 0
+        self.dropped = 0
+
+    def export(self) -> dict:
+        """خروجی قابل ذخیره در StateStore"""
+        self._expire(time.time())
+        return dict(self._seen)
+
+    def load(self, data: dict | None):
+        if not data:
+            return
+        now = time.time()
+        for fingerprint, expires_at in sorted(data.items(), key=lambda item: item[1]):
+            if expires_at > now:
+                self._seen[fingerprint] = expires_at
+        self._expire(now)
+        logger.debug("Dedup: restored %d fingerprints", len(self._seen))
+
+    def __len__(self):
+        return len(self._seen)
@@ -2,15 +2,29 @@
 ماژول غنی‌سازی داده‌ها با Failover و تلاش مجدد هوشمند.
 - Birdeye: تلاش مجدد برای خطاهای 429 و 5xx (مانند 521)
 - Dexscreener: به صورت Hardcode (بدون .env) و فقط تلاش مجدد برای 429
+- Dexscreener: یک جستجو برای هر نماد که بین همه زنجیره‌ها (و فراخواننده‌های همزمان) مشترک است
+- همه درخواست‌ها از محدودکننده نرخ مشترک هر Provider (modules/ratelimit.py) عبور می‌کنند.
 - لاگ‌نویسی هوشمند با ثبت پاسخ خطا از سرور.
+- کش آدرس‌ها (LRU + SQLite) جلوی get_contract_address با Negative Caching.
+- حالت Hedge: ارسال موازی درخواست Dexscreener پس از یک تاخیر قابل تنظیم.
+- Circuit Breaker هر Provider (modules/health.py): Provider خراب رد می‌شود و بقیه به ترتیب
+  تاخیر و نرخ موفقیت مشاهده‌شده امتحان می‌شوند.
+- enrich_within: غنی‌سازی با بودجه زمانی چرخه؛ آدرس‌های دیررس بعداً در پس‌زمینه تکمیل می‌شوند.
 """
 
 import httpx
 import os
+import time
 import asyncio
 import logging
 from httpx import ReadTimeout, ConnectError
 
+from modules.cache import get_address_cache, MISS
+from modules.ratelimit import get_limiter, all_limiters
+from modules.health import get_health, all_health, order_providers
+from modules.metrics import PROVIDER_REQUEST_SECONDS, PROVIDER_RETRIES, DEX_SEARCHES
+from modules.chains import network_for
+
 logger = logging.getLogger(__name__)
 
 # --- تنظیمات API ---
@@ -25,11 +39,27 @@ DEX_KEY = None  # API جستجوی Dexscreener نیازی به کلید ندار
 # --- تنظیمات تلاش مجدد ---
 REQUEST_TIMEOUT = 15
 MAX_RETRIES = 2
-SLEEP_RATE = 0.5  # تاخیر بین فراخوانی‌های gather در enrich_top_lists
 
 # کدهای وضعیتی که برای Birdeye منجر به تلاش مجدد می‌شوند (خطای سرور یا ریت لیمیت)
 BIRDEYE_RETRY_STATUS_CODES = [429, 500, 502, 503, 504, 521]
-BIRDEYE_RETRY_SLEEP_SECONDS = 3
+# مدت انتظار بین تلاش‌ها دیگر ثابت نیست: Retry-After یا Backoff نمایی با Jitter (modules/ratelimit.py)
+
+# --- استراتژی انتخاب Provider ---
+# failover: ابتدا Birdeye و فقط در صورت شکست Dexscreener (رفتار قبلی)
+# hedge: اگر Birdeye تا HEDGE_DELAY_SECONDS پاسخ نداد، Dexscreener هم موازی اجرا می‌شود
+ENRICH_STRATEGY = os.getenv("ENRICH_STRATEGY", "failover").lower()
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", 1.0))  # 0 = اجرای همزمان از ابتدا
+
+# --- تنظیمات کلاینت HTTP مشترک (Connection Pool) ---
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 120))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "0") == "1"
+
+# --- اشتراک جستجوی Dexscreener بین زنجیره‌ها ---
+# نتیجه جستجوی هر نماد این مدت (ثانیه) برای زنجیره‌های دیگر نگه داشته می‌شود (0 = فقط ادغام همزمان)
+DEX_SEARCH_MEMO_SECONDS = float(os.getenv("DEX_SEARCH_MEMO_SECONDS", 120))
+DEX_SEARCH_MEMO_MAX_ENTRIES = 1024
 
 
 def _get_response_snippet(response_text: str, length: int = 150) -> str:
@@ -39,8 +69,40 @@ def _get_response_snippet(response_text: str, length: int = 150) -> str:
     return (response_text[:length].replace("\n", " ") + "...")
 
 
+async def _timed_get(provider: str, client, url: str, **kwargs) -> httpx.Response:
+    """
+    درخواست GET با ثبت تاخیر در متریک PROVIDER_REQUEST_SECONDS (وضعیت HTTP یا نوع خطا)
+    و در آمار سلامت Provider؛ خطای شبکه و 5xx شکست حساب می‌شوند و 429 در Breaker اثری ندارد.
+    """
+    health = get_health(provider)
+    started = time.perf_counter()
+    status = "error"
+    try:
+        r = await client.get(url, **kwargs)
+        status = r.status_code
+        if r.status_code == 429:
+            health.release()
+        else:
+            health.record(r.status_code < 500, time.perf_counter() - started)
+        return r
+    except asyncio.CancelledError:
+        health.release()
+        raise
+    except Exception as e:
+        status = type(e).__name__
+        health.record(False, time.perf_counter() - started)
+        raise
+    finally:
+        PROVIDER_REQUEST_SECONDS.observe(time.perf_counter() - started, provider=provider, status=status)
+
+
 async def _query_birdeye(symbol, network, client):
-    """تماس با Birdeye API با Retry Logic هوشمند برای 5xx و 429"""
+    """
+    تماس با Birdeye API با Retry Logic هوشمند برای 5xx و 429
+
+    Returns:
+        آدرس در صورت موفقیت، رشته خالی اگر API پاسخ «یافت نشد» داد و None در صورت خطا
+    """
     params = {"symbol": symbol, "chain": network}
     headers = {"Authorization": f"Bearer {BIRDEYE_KEY}"} if BIRDEYE_KEY else {}
     
@@ -48,10 +110,19 @@ async def _query_birdeye(symbol, network, client):
         logger.error("BIRDEYE_API (EXTERNAL_API_ENDPOINT) در .env تنظیم نشده است.")
         return None
 
+    limiter = get_limiter("birdeye")
+    health = get_health("birdeye")
     try:
         for attempt in range(MAX_RETRIES):
-            r = await client.get(
-                BIRDEYE_API, 
+            await limiter.acquire()
+            # Breaker ممکن است در حین تلاش‌های مجدد (توسط درخواست‌های همزمان دیگر) باز شده باشد
+            if not health.allow_request():
+                logger.debug("BIRDEYE skipped (circuit %s): %s-%s", health.state, symbol, network)
+                return None
+            r = await _timed_get(
+                "birdeye",
+                client,
+                BIRDEYE_API,
                 params=params, 
                 headers=headers, 
                 timeout=REQUEST_TIMEOUT
@@ -68,144 +139,387 @@ async def _query_birdeye(symbol, network, client):
                     )
                     addr = sorted_[0].get("address")
                     if addr:
-                        logger.info(f"BIRDEYE OK: {symbol}-{network} -> {addr[:8]}...")
+                        logger.info("BIRDEYE OK: %s-%s -> %.8s...", symbol, network, addr)
                         return addr
                 
-                logger.debug(f"BIRDEYE NotFound: {symbol}-{network}")
-                return None
+                logger.debug("BIRDEYE NotFound: %s-%s", symbol, network)
+                return ""
             
             elif r.status_code in BIRDEYE_RETRY_STATUS_CODES:
                 snippet = _get_response_snippet(r.text)
+                # پس از آخرین تلاش انتظاری لازم نیست (ولی 429 همچنان Bucket را جریمه می‌کند)
+                has_next = attempt + 1 < MAX_RETRIES
+                delay = await limiter.backoff(attempt, r.status_code, r.headers, sleep=has_next)
+                if has_next:
+                    PROVIDER_RETRIES.inc(provider="birdeye", status=r.status_code)
                 logger.warning(
-                    f"BIRDEYE HTTP {r.status_code} (Retry {attempt+1}): "
-                    f"{symbol}-{network} | Resp: {snippet} | "
-                    f"Waiting {BIRDEYE_RETRY_SLEEP_SECONDS}s..."
+                    "BIRDEYE HTTP %s (Retry %d): %s-%s | Resp: %s | Waited %.1fs",
+                    r.status_code, attempt + 1, symbol, network, snippet, delay if has_next else 0
                 )
-                await asyncio.sleep(BIRDEYE_RETRY_SLEEP_SECONDS)
             
             else:
-                snippet = _get_response_snippet(r.text)
                 logger.warning(
-                    f"BIRDEYE HTTP {r.status_code} (No Retry): "
-                    f"{symbol}-{network} | Resp: {snippet}"
+                    "BIRDEYE HTTP %s (No Retry): %s-%s | Resp: %s",
+                    r.status_code, symbol, network, _get_response_snippet(r.text)
                 )
                 break 
                 
     except (ReadTimeout, ConnectError) as e:
-        logger.warning(f"BIRDEYE NetErr: {symbol}-{network}: {type(e).__name__}")
+        logger.warning("BIRDEYE NetErr: %s-%s: %s", symbol, network, type(e).__name__)
     except Exception as e:
-        logger.error(f"BIRDEYE UnexpErr: {symbol}-{network}: {e}", exc_info=False)
+        logger.error("BIRDEYE UnexpErr: %s-%s: %s", symbol, network, e, exc_info=False)
         
     return None
 
-async def _query_dexscreener(symbol, network, client):
+def _index_pairs(symbol: str, pairs: list) -> dict:
     """
-    [اصلاح شده] تماس با Dexscreener API (با آدرس Hardcode)
+    ایندکس جفت‌های یک پاسخ جستجو به تفکیک زنجیره؛ برای هر chainId جفتی با بیشترین
+    نقدینگی (و سپس حجم ۲۴ ساعته) که baseToken.symbol آن با نماد برابر است انتخاب می‌شود.
+
+    Returns:
+        dict: {chainId: address}
     """
-    query = f"{network} {symbol}"
-    params = {"q": query}
+    best = {}
+    for pair in pairs:
+        base = pair.get("baseToken") or {}
+        address = base.get("address")
+        if not address or (base.get("symbol") or "").upper() != symbol.upper():
+            continue
+        chain = pair.get("chainId")
+        score = (
+            (pair.get("liquidity") or {}).get("usd") or 0,
+            (pair.get("volume") or {}).get("h24") or 0,
+        )
+        if chain not in best or score > best[chain][0]:
+            best[chain] = (score, address)
+    return {chain: address for chain, (_, address) in best.items()}
+
+async def _search_dexscreener(symbol, client):
+    """
+    یک جستجوی Dexscreener برای نماد (بدون نام شبکه)؛ پاسخ شامل جفت‌های همه زنجیره‌هاست.
+
+    Returns:
+        dict {chainId: address} (ممکن است خالی باشد) یا None در صورت خطا
+    """
+    params = {"q": symbol}
     headers = {"Authorization": f"Bearer {DEX_KEY}"} if DEX_KEY else {}
     
     # بررسی .env حذف شد چون آدرس Hardcode است
     
+    limiter = get_limiter("dexscreener")
+    health = get_health("dexscreener")
     try:
         for attempt in range(MAX_RETRIES):
-            r = await client.get(
-                DEX_API, 
+            await limiter.acquire()
+            if not health.allow_request():
+                logger.debug("DEXSCREEN skipped (circuit %s): %s", health.state, symbol)
+                return None
+            r = await _timed_get(
+                "dexscreener",
+                client,
+                DEX_API,
                 params=params, 
                 headers=headers, 
                 timeout=REQUEST_TIMEOUT
             )
             
             if r.status_code == 200:
-                json_ = r.json()
-                results = json_.get("pairs", [])
-                if results:
-                    target_pair = None
-                    for pair in results:
-                        if pair.get("baseToken", {}).get("symbol", "").upper() == symbol.upper():
-                            target_pair = pair
-                            break
-                    
-                    if target_pair:
-                        addr = target_pair.get("baseToken", {}).get("address")
-                        if addr:
-                            logger.info(f"DEXSCREEN OK: {symbol}-{network} -> {addr[:8]}...")
-                            return addr
-
-                logger.debug(f"DEXSCREEN NotFound: {symbol}-{network} (Query: {query})")
-                return None
+                return _index_pairs(symbol, r.json().get("pairs") or [])
 
             elif r.status_code == 429:
                 snippet = _get_response_snippet(r.text)
+                has_next = attempt + 1 < MAX_RETRIES
+                delay = await limiter.backoff(attempt, r.status_code, r.headers, sleep=has_next)
+                if has_next:
+                    PROVIDER_RETRIES.inc(provider="dexscreener", status=r.status_code)
                 logger.warning(
-                    f"DEXSCREEN HTTP 429 (Retry {attempt+1}): "
-                    f"{query} | Resp: {snippet} | Waiting 1s..."
+                    "DEXSCREEN HTTP 429 (Retry %d): %s | Resp: %s | Waited %.1fs",
+                    attempt + 1, symbol, snippet, delay if has_next else 0
                 )
-                await asyncio.sleep(1)
             
             else:
-                snippet = _get_response_snippet(r.text)
                 logger.warning(
-                    f"DEXSCREEN HTTP {r.status_code} (No Retry): "
-                    f"{query} | Resp: {snippet}"
+                    "DEXSCREEN HTTP %s (No Retry): %s | Resp: %s",
+                    r.status_code, symbol, _get_response_snippet(r.text)
                 )
                 break
                 
     except (ReadTimeout, ConnectError) as e:
-        logger.warning(f"DEXSCREEN NetErr: {query}: {type(e).__name__}")
+        logger.warning("DEXSCREEN NetErr: %s: %s", symbol, type(e).__name__)
     except Exception as e:
-        logger.error(f"DEXSCREEN UnexpErr: {query}: {e}", exc_info=False)
+        logger.error("DEXSCREEN UnexpErr: %s: %s", symbol, e, exc_info=False)
         
     return None
 
-async def get_contract_address(symbol: str, network: str, http_client: httpx.AsyncClient) -> str:
-    """تلاش برای واکشی آدرس با Failover بین Birdeye و Dexscreener"""
-    symbol_clean = symbol.replace("$", "").replace("#", "").strip().upper()
-    network_map = {"SOL": "solana", "BNB": "bsc"}
-    network_query = network_map.get(network.upper(), network.lower())
-    
-    addr = await _query_birdeye(symbol_clean, network_query, http_client)
+# جستجوهای در حال اجرا و نتایج اخیر Dexscreener به ازای نماد (مشترک بین همه زنجیره‌ها)
+_dex_inflight = {}
+_dex_memo = {}  # symbol -> (expires_at, {chainId: address})
+
+def _dex_search_done(symbol: str, task: asyncio.Task):
+    _dex_inflight.pop(symbol, None)
+    if task.cancelled() or task.result() is None or DEX_SEARCH_MEMO_SECONDS <= 0:
+        return
+    now = time.monotonic()
+    if len(_dex_memo) >= DEX_SEARCH_MEMO_MAX_ENTRIES:
+        for key in [k for k, (expires_at, _) in _dex_memo.items() if expires_at <= now]:
+            del _dex_memo[key]
+    if len(_dex_memo) < DEX_SEARCH_MEMO_MAX_ENTRIES:
+        _dex_memo[symbol] = (now + DEX_SEARCH_MEMO_SECONDS, task.result())
+
+async def _dex_lookup_index(symbol: str, client):
+    """
+    ایندکس جفت‌های نماد با ادغام درخواست‌های همزمان: فراخواننده‌های همزمان منتظر یک Task
+    مشترک می‌مانند و نتیجه موفق تا DEX_SEARCH_MEMO_SECONDS برای زنجیره‌های دیگر نگه داشته می‌شود.
+    """
+    memo = _dex_memo.get(symbol)
+    if memo is not None and memo[0] > time.monotonic():
+        DEX_SEARCHES.inc(source="memo")
+        return memo[1]
+
+    task = _dex_inflight.get(symbol)
+    if task is None:
+        task = asyncio.create_task(_search_dexscreener(symbol, client))
+        task.add_done_callback(lambda t, s=symbol: _dex_search_done(s, t))
+        _dex_inflight[symbol] = task
+        DEX_SEARCHES.inc(source="request")
+    else:
+        DEX_SEARCHES.inc(source="inflight")
+    # shield: لغو یک فراخواننده (مثلاً بازنده Hedge) نباید جستجوی مشترک بقیه را لغو کند
+    return await asyncio.shield(task)
+
+async def _query_dexscreener(symbol, network, client):
+    """
+    آدرس نماد روی یک شبکه از جستجوی مشترک Dexscreener (یک درخواست برای همه زنجیره‌ها)
+
+    Returns:
+        آدرس در صورت موفقیت، رشته خالی اگر API پاسخ «یافت نشد» داد و None در صورت خطا
+    """
+    index = await _dex_lookup_index(symbol, client)
+    if index is None:
+        return None
+    addr = index.get(network)
     if addr:
+        logger.info("DEXSCREEN OK: %s-%s -> %.8s...", symbol, network, addr)
         return addr
+    logger.debug("DEXSCREEN NotFound: %s-%s", symbol, network)
+    return ""
+
+def normalize_lookup_key(symbol: str, network: str) -> tuple[str, str]:
+    """کلید جستجو/کش: نماد بدون $ و # با حروف بزرگ و نام شبکه در قالب API (از modules/chains.py)"""
+    symbol_clean = symbol.replace("$", "").replace("#", "").strip().upper()
+    return symbol_clean, network_for(network)
+
+# Providerها به ترتیب پیش‌فرض (قبل از جمع شدن آمار سلامت)
+PROVIDERS = {
+    "birdeye": _query_birdeye,
+    "dexscreener": _query_dexscreener,
+}
+
+async def _lookup_failover(symbol_clean: str, network_query: str, http_client) -> tuple[str, bool]:
+    """
+    جستجوی ترتیبی: Providerهای سالم به ترتیب order_providers و در صورت شکست هر کدام، بعدی.
+
+    Returns:
+        tuple: (address, not_found) - not_found فقط وقتی True است که همه APIها پاسخ قطعی «یافت نشد» داده باشند
+    """
+    results = []
+    for name in order_providers(list(PROVIDERS)):
+        addr = await PROVIDERS[name](symbol_clean, network_query, http_client)
+        if addr:
+            return addr, False
+        results.append(addr)
+        logger.debug("%s failed for %s-%s, trying next provider...", name, symbol_clean, network_query)
+    
+    return "", len(results) == len(PROVIDERS) and all(r == "" for r in results)
+
+async def _lookup_hedged(symbol_clean: str, network_query: str, http_client) -> tuple[str, bool]:
+    """
+    جستجوی Hedge: بهترین Provider فوراً اجرا می‌شود و اگر تا HEDGE_DELAY_SECONDS نتیجه نداد،
+    Provider دوم به صورت موازی شروع می‌شود. اولین آدرس معتبر برنده است
+    (در صورت تساوی Provider اول ترجیح دارد) و درخواست بازنده لغو می‌شود.
+    """
+    order = order_providers(list(PROVIDERS))
+    if len(order) < 2:
+        return await _lookup_failover(symbol_clean, network_query, http_client)
+    primary, secondary = order[:2]
+    
+    primary_task = asyncio.create_task(PROVIDERS[primary](symbol_clean, network_query, http_client))
+    secondary_task = None
+    try:
+        if HEDGE_DELAY_SECONDS > 0:
+            await asyncio.wait({primary_task}, timeout=HEDGE_DELAY_SECONDS)
+            if primary_task.done() and primary_task.result():
+                return primary_task.result(), False
+        
+        logger.debug("HEDGE: starting %s for %s-%s", secondary, symbol_clean, network_query)
+        secondary_task = asyncio.create_task(PROVIDERS[secondary](symbol_clean, network_query, http_client))
+        tasks = (primary_task, secondary_task)
+        pending = {t for t in tasks if not t.done()}
+        
+        while True:
+            # ترتیب tasks تضمین می‌کند که در صورت اتمام همزمان، Provider اول انتخاب شود
+            for task in tasks:
+                if task.done() and task.result():
+                    return task.result(), False
+            if not pending:
+                break
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        
+        not_found = len(tasks) == len(PROVIDERS) and all(task.result() == "" for task in tasks)
+        return "", not_found
+    finally:
+        for task in (primary_task, secondary_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+async def get_contract_address(symbol: str, network: str, http_client: httpx.AsyncClient) -> str:
+    """
+    تلاش برای واکشی آدرس با Failover (یا Hedge) بین Providerهای سالم.
+    ابتدا کش بررسی می‌شود؛ «یافت نشد» فقط وقتی کش می‌شود که هر دو API پاسخ قطعی داده باشند
+    (خطاهای شبکه و 5xx کش نمی‌شوند).
+    """
+    symbol_clean, network_query = normalize_lookup_key(symbol, network)
+    
+    cache = get_address_cache()
+    if cache is not None:
+        cached = cache.get(symbol_clean, network_query)
+        if cached is not MISS:
+            logger.debug("CACHE HIT: %s-%s -> %.8s", symbol_clean, network_query, cached or "NotFound")
+            return cached
     
-    logger.debug(f"Birdeye failed for {symbol}-{network}, trying Dexscreener...")
+    if ENRICH_STRATEGY == "hedge":
+        addr, not_found = await _lookup_hedged(symbol_clean, network_query, http_client)
+    else:
+        addr, not_found = await _lookup_failover(symbol_clean, network_query, http_client)
     
-    addr = await _query_dexscreener(symbol_clean, network_query, http_client)
+    if cache is not None and (addr or not_found):
+        cache.set(symbol_clean, network_query, addr)
     if addr:
         return addr
     
-    logger.debug(f"FAIL: {symbol}-{network} NO ADDRESS (tried both APIs)")
+    logger.debug("FAIL: %s-%s NO ADDRESS (tried both APIs)", symbol, network)
     return ""
 
-async def enrich_top_lists(top_sol: list, top_bnb: list) -> tuple[list, list]:
-    """لیست‌های تاپ ۵ را با آدرس قرارداد غنی‌سازی می‌کند (با استفاده از asyncio.gather)"""
-    async with httpx.AsyncClient() as client:
-        enriched_sol, enriched_bnb = [], []
-        
-        # --- پردازش SOL ---
-        tasks_sol = []
-        for symbol, count in top_sol:
-            tasks_sol.append(get_contract_address(symbol, 'SOL', client))
-        
-        results_sol = await asyncio.gather(*tasks_sol)
-        enriched_sol = [
-            (top_sol[i][0], top_sol[i][1], addr or "") 
-            for i, addr in enumerate(results_sol)
-        ]
-        
-        await asyncio.sleep(SLEEP_RATE)
-        
-        # --- پردازش BNB ---
-        tasks_bnb = []
-        for symbol, count in top_bnb:
-            tasks_bnb.append(get_contract_address(symbol, 'BNB', client))
-            
-        results_bnb = await asyncio.gather(*tasks_bnb)
-        enriched_bnb = [
-            (top_bnb[i][0], top_bnb[i][1], addr or "") 
-            for i, addr in enumerate(results_bnb)
-        ]
-
-        logger.info(f"Enrich: {len(results_sol)} SOL, {len(results_bnb)} BNB tasks done")
-        return enriched_sol, enriched_bnb
\ No newline at end of file
+def create_http_client() -> httpx.AsyncClient:
+    """
+    ساخت کلاینت HTTP بلندمدت با Connection Pool و Keep-Alive.
+    این کلاینت یک بار در main() ساخته می‌شود تا هزینه DNS/TCP/TLS در هر چرخه تکرار نشود.
+    """
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401 - فقط برای بررسی نصب بودن پکیج httpx[http2]
+        except ImportError:
+            logger.warning("HTTP2_ENABLED=1 but the 'h2' package is not installed; falling back to HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    logger.info(
+        f"HTTP client: max_conn={HTTP_MAX_CONNECTIONS}, keepalive={HTTP_MAX_KEEPALIVE_CONNECTIONS}, "
+        f"expiry={HTTP_KEEPALIVE_EXPIRY}s, http2={http2}"
+    )
+    return httpx.AsyncClient(limits=limits, http2=http2, timeout=REQUEST_TIMEOUT)
+
+async def enrich_top_lists(
+    tops: dict,
+    http_client: httpx.AsyncClient | None = None,
+) -> dict:
+    """
+    لیست‌های تاپ ۵ همه زنجیره‌ها را با آدرس قرارداد غنی‌سازی می‌کند (با یک asyncio.gather)
+
+    Args:
+        tops: {chain: لیست (symbol, count)}
+        http_client: کلاینت مشترک ساخته‌شده با create_http_client؛
+            اگر داده نشود یک کلاینت موقت برای همین فراخوانی ساخته و بسته می‌شود.
+
+    Returns:
+        dict: {chain: لیست (symbol, count, address)} با همان ترتیب زنجیره‌های ورودی
+    """
+    if http_client is None:
+        async with create_http_client() as client:
+            return await _enrich_with_client(tops, client)
+    return await _enrich_with_client(tops, http_client)
+
+def _start_lookups(tops: dict, client: httpx.AsyncClient) -> list:
+    # محدودکننده نرخ هر Provider جلوی 429 را می‌گیرد، پس همه زنجیره‌ها در یک دسته همزمان اجرا می‌شوند
+    return [
+        asyncio.ensure_future(get_contract_address(symbol, chain, client))
+        for chain, top in tops.items()
+        for symbol, _ in top
+    ]
+
+def _collect(tops: dict, tasks: list) -> dict:
+    """نتیجه Taskهای تمام‌شده؛ آدرس Taskهای ناتمام یا ناموفق خالی می‌ماند"""
+    results = iter(tasks)
+    enriched = {}
+    for chain, top in tops.items():
+        rows = []
+        for symbol, count in top:
+            task = next(results)
+            done = task.done() and not task.cancelled() and task.exception() is None
+            rows.append((symbol, count, (task.result() if done else None) or ""))
+        enriched[chain] = rows
+    return enriched
+
+def _finish_run(tops: dict):
+    """پایان یک اجرای غنی‌سازی: یک commit برای همه آدرس‌های جدید کش و ثبت آمار"""
+    logger.info("Enrich: %s tasks done", ", ".join(f"{len(top)} {chain}" for chain, top in tops.items()))
+    cache = get_address_cache()
+    if cache is not None:
+        cache.flush()
+        stats = cache.stats()
+        logger.info(
+            f"AddressCache: hits={stats['hits']} negative_hits={stats['negative_hits']} "
+            f"misses={stats['misses']} size={stats['size']}"
+        )
+    for name, limiter in all_limiters().items():
+        logger.info("RateLimiter[%s]: %s", name, limiter.stats())
+    for name, health in all_health().items():
+        logger.info("Health[%s]: %s", name, health.stats())
+
+async def _enrich_with_client(tops: dict, client: httpx.AsyncClient) -> dict:
+    tasks = _start_lookups(tops, client)
+    await asyncio.gather(*tasks)
+    enriched = _collect(tops, tasks)
+    _finish_run(tops)
+    return enriched
+
+async def enrich_within(
+    tops: dict,
+    http_client: httpx.AsyncClient,
+    timeout: float | None,
+) -> tuple[dict, asyncio.Task | None]:
+    """
+    غنی‌سازی با سقف زمانی: پس از timeout ثانیه هر آدرسی که تا آن لحظه پیدا شده برگردانده می‌شود
+    و جستجوی بقیه در پس‌زمینه ادامه پیدا می‌کند.
+
+    Args:
+        tops: {chain: لیست (symbol, count)}
+        http_client: کلاینت مشترک (باید پس از بازگشت هم باز بماند)
+        timeout: بودجه زمانی به ثانیه (None = بدون محدودیت، معادل enrich_top_lists)
+
+    Returns:
+        tuple: (enriched, completion) - completion یک Task است که به نتیجه کامل
+            {chain: لیست (symbol, count, address)} می‌رسد، یا None اگر همه آدرس‌ها به موقع کامل شدند
+    """
+    tasks = _start_lookups(tops, http_client)
+    pending = ()
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    enriched = _collect(tops, tasks)
+    if not pending:
+        _finish_run(tops)
+        return enriched, None
+
+    logger.warning("Enrich: budget of %.1fs exhausted, %d/%d lookups still running", timeout, len(pending), len(tasks))
+
+    async def complete() -> dict:
+        await asyncio.gather(*pending, return_exceptions=True)
+        _finish_run(tops)
+        return _collect(tops, tasks)
+
+    return enriched, asyncio.create_task(complete())
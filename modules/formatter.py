@@ -4,6 +4,8 @@
 from datetime import datetime, UTC
 import logging
 
+from modules.chains import header_for
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,11 +19,8 @@ def _format_single_chain(enriched_data: list, chain_name: str) -> str:
 
     lines = []
     
-    # تنظیم هدر بر اساس نام زنجیره
-    if chain_name.upper() == "SOL":
-        lines.append("🏆 **Top 5 Trending - $SOL** 🏆\n")
-    elif chain_name.upper() == "BNB":
-        lines.append("🔥 **Top 5 Trending - $BNB** 🔥\n")
+    # تنظیم هدر بر اساس نام زنجیره (modules/chains.py)
+    lines.append(header_for(chain_name) + "\n")
 
     # حذف خط timestamp و تعداد تکرار طبق درخواست
     for idx, (symbol, count, address) in enumerate(enriched_data, 1):
@@ -29,18 +28,38 @@ def _format_single_chain(enriched_data: list, chain_name: str) -> str:
         lines.append(f"   `{address}`\n" if address else "   \n")
     
     msg = '\n'.join(lines)
-    logger.debug(f"Formatter: MessageLen={len(msg)} for {chain_name}")
+    logger.debug("Formatter: MessageLen=%d for %s", len(msg), chain_name)
     # .strip() برای حذف هرگونه خط خالی اضافه در ابتدا یا انتها
     return msg.strip()
 
 
-def format_output_message(enriched_sol: list, enriched_bnb: list) -> tuple[str, str]:
+def format_output_message(enriched: dict) -> dict:
     """
-    دو لیست غنی‌شده را گرفته و دو پیام مجزا (sol_message, bnb_message) برمی‌گرداند.
+    لیست‌های غنی‌شده هر زنجیره را گرفته و برای هر کدام یک پیام مجزا برمی‌گرداند.
+
+    Returns:
+        dict: {chain: message} با همان ترتیب زنجیره‌های ورودی
     """
-    
-    sol_message = _format_single_chain(enriched_sol, "SOL")
-    bnb_message = _format_single_chain(enriched_bnb, "BNB")
-    
-    # بازگرداندن دو پیام به صورت مجزا
-    return sol_message, bnb_message
\ No newline at end of file
+    return {chain: _format_single_chain(data, chain) for chain, data in enriched.items()}
+
+
+def format_multi_window_message(rankings: dict, chain_name: str) -> str:
+    """
+    رتبه‌بندی چند افق زمانی یک زنجیره را در یک پیام خلاصه می‌کند.
+
+    Args:
+        rankings: {window_minutes: [(symbol, count), ...]}
+        chain_name: کلید زنجیره (مثلاً SOL)
+    """
+    if not any(rankings.values()):
+        return ""
+
+    lines = [f"📈 **Multi-Horizon Trending - ${chain_name.upper()}** 📈\n"]
+    for window, top in sorted(rankings.items()):
+        label = f"{window // 60}h" if window % 60 == 0 else f"{window}m"
+        symbols = ", ".join(f"**{symbol}**" for symbol, _ in top) or "-"
+        lines.append(f"⏱ {label}: {symbols}")
+
+    msg = '\n'.join(lines)
+    logger.debug("Formatter: MultiWindow MessageLen=%d for %s", len(msg), chain_name)
+    return msg.strip()
@@ -0,0 +1,158 @@
+"""
+ماژول سلامت Providerها (Circuit Breaker) برای غنی‌سازی
+- وضعیت closed / open / half-open برای هر Provider
+- آمار لغزان تاخیر و نرخ موفقیت آخرین درخواست‌ها برای مرتب‌سازی پویا
+- اطلاع‌رسانی تغییر وضعیت به Listenerها (مثلاً notify_admin در main.py)
+"""
+
+import os
+import time
+import logging
+from collections import deque
+
+from modules.metrics import BREAKER_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+# --- تنظیمات پیش‌فرض ---
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))  # خطای پیاپی تا باز شدن
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("BREAKER_COOLDOWN_SECONDS", 60))  # مدت باز ماندن پیش از آزمایش
+HEALTH_WINDOW_SIZE = int(os.getenv("HEALTH_WINDOW_SIZE", 50))  # تعداد نمونه‌های آمار لغزان
+HEALTH_MIN_SAMPLES = int(os.getenv("HEALTH_MIN_SAMPLES", 5))  # پیش از این تعداد، ترتیب پیش‌فرض حفظ می‌شود
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class ProviderHealth:
+    """Circuit Breaker یک Provider همراه با آمار لغزان تاخیر و موفقیت"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        cooldown: float = BREAKER_COOLDOWN_SECONDS,
+        window: int = HEALTH_WINDOW_SIZE,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._samples = deque(maxlen=window)  # (ok, latency)
+
+    def _transition(self, new_state: str, reason: str):
+        old_state, self.state = self.state, new_state
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        logger.warning("Health[%s]: %s -> %s (%s)", self.name, old_state, new_state, reason)
+        BREAKER_TRANSITIONS.inc(provider=self.name, state=new_state)
+        for listener in list(_listeners):
+            try:
+                listener(self.name, old_state, new_state)
+            except Exception as e:
+                logger.error("Health[%s]: listener failed: %s", self.name, e)
+
+    def available(self) -> bool:
+        """آیا Provider در ترتیب جستجو قرار می‌گیرد (بدون رزرو درخواست آزمایشی)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.monotonic() - self._opened_at >= self.cooldown
+        return not self._probe_in_flight
+
+    def allow_request(self) -> bool:
+        """
+        اجازه ارسال یک درخواست HTTP. در حالت باز پس از پایان Cooldown فقط یک درخواست
+        آزمایشی (half-open) مجاز است تا نتیجه آن وضعیت بعدی را مشخص کند.
+        """
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._transition(HALF_OPEN, "cooldown elapsed")
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def release(self):
+        """آزادسازی درخواست آزمایشی لغوشده (بدون ثبت نتیجه)"""
+        self._probe_in_flight = False
+
+    def record(self, ok: bool, latency: float):
+        self._probe_in_flight = False
+        self._samples.append((ok, latency))
+        if ok:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED, "probe succeeded")
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self._transition(OPEN, "probe failed")
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._transition(OPEN, f"{self.consecutive_failures} consecutive failures")
+
+    def success_rate(self) -> float:
+        if not self._samples:
+            return 1.0
+        return sum(1 for ok, _ in self._samples if ok) / len(self._samples)
+
+    def mean_latency(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(latency for _, latency in self._samples) / len(self._samples)
+
+    def score(self) -> float:
+        """هزینه مورد انتظار یک پاسخ موفق (کمتر = بهتر)"""
+        return self.mean_latency() / max(self.success_rate(), 0.05)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "samples": len(self._samples),
+            "success_rate": round(self.success_rate(), 3),
+            "mean_latency": round(self.mean_latency(), 3),
+        }
+
+
+_health = {}
+_listeners = []
+
+
+def get_health(name: str) -> ProviderHealth:
+    health = _health.get(name)
+    if health is None:
+        health = _health[name] = ProviderHealth(name)
+    return health
+
+
+def all_health() -> dict:
+    return dict(_health)
+
+
+def order_providers(names: list) -> list:
+    """
+    Providerهای در دسترس به ترتیب امتیاز (تاخیر / نرخ موفقیت)؛ Providerهای با Breaker باز حذف می‌شوند.
+    تا جمع شدن HEALTH_MIN_SAMPLES نمونه برای همه، ترتیب پیش‌فرض names حفظ می‌شود.
+    """
+    available = [name for name in names if get_health(name).available()]
+    if all(len(get_health(name)._samples) >= HEALTH_MIN_SAMPLES for name in available):
+        # sorted پایدار است؛ در امتیاز برابر ترتیب پیش‌فرض حفظ می‌شود
+        available.sort(key=lambda name: get_health(name).score())
+    return available
+
+
+def add_listener(callback):
+    """callback(provider, old_state, new_state) در هر تغییر وضعیت Breaker فراخوانی می‌شود"""
+    _listeners.append(callback)
+
+
+def reset_health():
+    """حذف وضعیت همه Providerها (مثلاً بین اجراهای بنچمارک)"""
+    _health.clear()
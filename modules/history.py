@@ -0,0 +1,312 @@
+"""
+ماژول تاریخچه فشرده ترندها (append-only)
+- نمادها و نام زنجیره‌ها در یک جدول رشته (symbols.txt) به شناسه عددی تبدیل می‌شوند
+- هر رکورد ۱۶ بایت با طول ثابت: (timestamp u32, symbol_id u32, chain_id u16, pad, count f32)
+- هر ماه یک فایل Segment (YYYY-MM.bin)؛ خواندن با mmap و جستجوی دودویی روی زمان
+  (اگر رکورد قدیمی‌تری بعداً اضافه شود، مثلاً در Backfill، فایل YYYY-MM.unsorted ساخته شده
+  و آن Segment تا اجرای compact به صورت کامل پیمایش می‌شود)
+- زمان هر رکورد «پایان» بازه شمارش است (ربات شمارش چرخه را در لحظه اجرای آن ثبت می‌کند و
+  Backfill هم باکت [t, t + interval) را در t + interval)
+- یک سال داده Heatmap (حدود ۱۰۰ نماد در ۴۸ چرخه روزانه) کمتر از ۳۰ مگابایت است
+- هر پوشه فقط یک نویسنده دارد (قفل انحصاری history.lock)، چون شناسه نمادها از جدول رشته
+  درون حافظه همان Process داده می‌شود و دو نویسنده شناسه‌های یکدیگر را خراب می‌کنند
+"""
+
+import os
+import mmap
+import struct
+import logging
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, UTC
+
+try:
+    import fcntl
+except ImportError:  # Windows: بدون قفل بین Processها
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") != "0"
+HISTORY_DIR = os.getenv("HISTORY_DIR", "history")
+
+_RECORD = struct.Struct("<IIHxxf")
+RECORD_SIZE = _RECORD.size  # 16
+_SYMBOLS_FILE = "symbols.txt"
+_LOCK_FILE = "history.lock"
+
+
+class HistoryLockedError(RuntimeError):
+    """پوشه تاریخچه در اختیار Process دیگری است (مثلاً ربات در حال اجرا یا backfill)"""
+
+
+def _segment_name(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, UTC).strftime("%Y-%m") + ".bin"
+
+
+def _segment_bounds(name: str) -> tuple[float, float]:
+    """بازه زمانی [start, end) یک Segment ماهانه"""
+    start = datetime.strptime(name[:-4], "%Y-%m").replace(tzinfo=UTC)
+    if start.month == 12:
+        end = start.replace(year=start.year + 1, month=1)
+    else:
+        end = start.replace(month=start.month + 1)
+    return start.timestamp(), end.timestamp()
+
+
+class _RecordView:
+    """دسترسی تصادفی به رکوردهای یک Segment نگاشت‌شده در حافظه (برای bisect روی timestamp)"""
+
+    def __init__(self, buffer, count: int):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index: int) -> int:
+        return _RECORD.unpack_from(self._buffer, index * RECORD_SIZE)[0]
+
+
+class HistoryStore:
+    """ذخیره‌ساز append-only شمارش نمادها در هر چرخه با Segmentهای ماهانه"""
+
+    def __init__(self, directory: str = HISTORY_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = self._acquire_lock()
+        self._strings = []
+        self._ids = {}
+        self._symbols_file = None
+        self._segment = None  # (name, file, last_timestamp)
+        self._load_strings()
+
+    def _acquire_lock(self):
+        lock_file = open(os.path.join(self.directory, _LOCK_FILE), "a")
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise HistoryLockedError(
+                f"history directory {self.directory} is already opened by another process"
+            ) from None
+        return lock_file
+
+    # --- جدول رشته‌ها ---
+
+    def _load_strings(self):
+        path = os.path.join(self.directory, _SYMBOLS_FILE)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    value = line.rstrip("\n")
+                    self._ids.setdefault(value, len(self._strings))
+                    self._strings.append(value)
+        self._symbols_file = open(path, "a", encoding="utf-8")
+        logger.debug("History: %d interned strings in %s", len(self._strings), self.directory)
+
+    def intern(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = self._ids[value] = len(self._strings)
+            self._strings.append(value)
+            self._symbols_file.write(value + "\n")
+        return string_id
+
+    def lookup(self, value: str) -> int | None:
+        return self._ids.get(value)
+
+    def string(self, string_id: int) -> str:
+        return self._strings[string_id]
+
+    # --- نوشتن ---
+
+    def _open_segment(self, timestamp: float):
+        name = _segment_name(timestamp)
+        if self._segment is not None and self._segment[0] == name:
+            return self._segment
+        if self._segment is not None:
+            self._segment[1].close()
+        path = os.path.join(self.directory, name)
+        f = open(path, "a+b")
+        # رکورد ناقص (مثلاً پس از قطع برق) حذف می‌شود تا ترازبندی رکوردها حفظ شود
+        size = f.seek(0, os.SEEK_END)
+        if size % RECORD_SIZE:
+            size -= size % RECORD_SIZE
+            f.truncate(size)
+            logger.warning("History: truncated partial record in %s", path)
+        last_timestamp = 0
+        if size:
+            f.seek(size - RECORD_SIZE)
+            last_timestamp = _RECORD.unpack(f.read(RECORD_SIZE))[0]
+        f.seek(0, os.SEEK_END)
+        self._segment = [name, f, last_timestamp]
+        return self._segment
+
+    def append(self, timestamp: float, chain: str, counts):
+        """
+        ثبت شمارش‌های یک زنجیره در یک لحظه.
+
+        Args:
+            counts: Counter یا dict از symbol -> count (یا iterable از جفت‌ها)
+        """
+        items = counts.items() if hasattr(counts, "items") else counts
+        chain_id = self.intern(chain)
+        ts = int(timestamp)
+        payload = b"".join(
+            _RECORD.pack(ts, self.intern(symbol), chain_id, count)
+            for symbol, count in items
+            if count
+        )
+        if not payload:
+            return
+        # جدول رشته‌ها پیش از رکوردها روی دیسک می‌رود تا هیچ رکوردی به شناسه نامعلوم اشاره نکند
+        self._symbols_file.flush()
+        segment = self._open_segment(timestamp)
+        if ts < segment[2]:
+            open(os.path.join(self.directory, segment[0][:-4] + ".unsorted"), "a").close()
+        segment[2] = max(segment[2], ts)
+        segment[1].write(payload)
+        segment[1].flush()
+
+    def compact(self) -> int:
+        """
+        مرتب‌سازی دوباره Segmentهای دارای نشانگر .unsorted بر اساس زمان و حذف نشانگر،
+        تا پرسش‌ها دوباره از جستجوی دودویی استفاده کنند. جایگزینی فایل اتمیک است.
+
+        Returns:
+            int: تعداد Segmentهای مرتب‌شده
+        """
+        if self._segment is not None:
+            # Segment باز ممکن است جایگزین شود؛ در append بعدی دوباره باز می‌شود
+            self._segment[1].close()
+            self._segment = None
+
+        compacted = 0
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".unsorted"):
+                continue
+            marker = os.path.join(self.directory, name)
+            path = marker[:-len(".unsorted")] + ".bin"
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    data = f.read()
+                data = data[:len(data) - len(data) % RECORD_SIZE]
+                # sort پایدار است؛ ترتیب رکوردهای هم‌زمان حفظ می‌شود
+                records = sorted(_RECORD.iter_unpack(data), key=lambda record: record[0])
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(b"".join(_RECORD.pack(*record) for record in records))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                logger.info("History: compacted %s (%d records)", os.path.basename(path), len(records))
+            os.remove(marker)
+            compacted += 1
+        return compacted
+
+    # --- خواندن ---
+
+    def _segments(self, start: float | None, end: float | None) -> list:
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.endswith(".bin") and len(name) == 11
+        )
+        selected = []
+        for name in names:
+            seg_start, seg_end = _segment_bounds(name)
+            if (end is None or seg_start < end) and (start is None or seg_end > start):
+                selected.append(os.path.join(self.directory, name))
+        return selected
+
+    def iter_raw(self, start: float | None = None, end: float | None = None):
+        """
+        رکوردهای خام در بازه [start, end) به ترتیب Segment (و به ترتیب زمان در Segmentهای مرتب).
+
+        Yields:
+            tuple: (timestamp, symbol_id, chain_id, count)
+        """
+        if self._segment is not None:
+            self._segment[1].flush()
+        for path in self._segments(start, end):
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                count = size // RECORD_SIZE
+                if not count:
+                    continue
+                with mmap.mmap(f.fileno(), count * RECORD_SIZE, access=mmap.ACCESS_READ) as mm:
+                    if os.path.exists(path[:-4] + ".unsorted"):
+                        for record in _RECORD.iter_unpack(mm):
+                            if (start is None or record[0] >= start) and (end is None or record[0] < end):
+                                yield record
+                        continue
+                    view = _RecordView(mm, count)
+                    lo = bisect_left(view, start) if start is not None else 0
+                    hi = bisect_left(view, end) if end is not None else count
+                    if lo < hi:
+                        yield from _RECORD.iter_unpack(mm[lo * RECORD_SIZE:hi * RECORD_SIZE])
+
+    def series(
+        self,
+        symbol: str,
+        chain: str | None = None,
+        start: float | None = None,
+        end: float | None = None,
+        bucket_seconds: int | None = None,
+    ) -> list:
+        """
+        سری زمانی شمارش یک نماد (اختیاری: فقط یک زنجیره و تجمیع در باکت‌های زمانی).
+
+        Returns:
+            list: [(timestamp, count), ...] به ترتیب زمان
+        """
+        symbol_id = self.lookup(symbol)
+        chain_id = self.lookup(chain) if chain is not None else None
+        if symbol_id is None or (chain is not None and chain_id is None):
+            return []
+
+        totals = {}
+        for ts, sid, cid, count in self.iter_raw(start, end):
+            if sid != symbol_id or (chain_id is not None and cid != chain_id):
+                continue
+            if bucket_seconds:
+                ts -= ts % bucket_seconds
+            totals[ts] = totals.get(ts, 0.0) + count
+        return sorted(totals.items())
+
+    def top_k(
+        self,
+        start: float | None = None,
+        end: float | None = None,
+        k: int = 10,
+        chain: str | None = None,
+    ) -> list:
+        """
+        پرتکرارترین نمادها در بازه [start, end).
+
+        Returns:
+            list: [(symbol, count), ...]
+        """
+        chain_id = self.lookup(chain) if chain is not None else None
+        if chain is not None and chain_id is None:
+            return []
+
+        totals = Counter()
+        for _, sid, cid, count in self.iter_raw(start, end):
+            if chain_id is None or cid == chain_id:
+                totals[sid] += count
+        return [(self._strings[sid], count) for sid, count in totals.most_common(k)]
+
+    def close(self):
+        if self._segment is not None:
+            self._segment[1].close()
+            self._segment = None
+        if self._symbols_file is not None:
+            self._symbols_file.close()
+            self._symbols_file = None
+        if self._lock_file is not None:
+            # بستن فایل قفل flock را آزاد می‌کند
+            self._lock_file.close()
+            self._lock_file = None
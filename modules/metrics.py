@@ -0,0 +1,238 @@
+"""
+ماژول متریک‌های سبک (Counter و Histogram) برای زمان‌سنجی مراحل و شمارش رویدادها
+- خروجی متنی Prometheus از یک سرور HTTP کوچک روی همان حلقه asyncio
+- یا نوشتن دوره‌ای Snapshot به صورت JSON
+- هزینه هر ثبت فقط یک جستجوی دیکشنری و یک جمع است (بدون قفل و بدون I/O)
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))  # 0 = سرور غیرفعال
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH", "")
+METRICS_SNAPSHOT_INTERVAL = int(os.getenv("METRICS_SNAPSHOT_INTERVAL", 60))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class CounterMetric(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        return [f"{self.name}{self._format_labels(key)} {value:g}" for key, value in self._values.items()]
+
+    def snapshot(self) -> dict:
+        return {",".join(key) or "_": value for key, value in self._values.items()}
+
+
+class HistogramMetric(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # [شمارش هر باکت (غیرتجمعی)..., باکت +Inf] , مجموع
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = self._format_labels(key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += counts[-1]
+            labels = self._format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total:g}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+    def snapshot(self) -> dict:
+        return {
+            ",".join(key) or "_": {"count": sum(counts), "sum": round(total, 6)}
+            for key, (counts, total) in self._values.items()
+        }
+
+
+_registry = {}
+
+
+def _register(metric):
+    existing = _registry.get(metric.name)
+    if existing is not None:
+        return existing
+    _registry[metric.name] = metric
+    return metric
+
+
+def counter(name: str, help_text: str, labelnames: tuple = ()) -> CounterMetric:
+    return _register(CounterMetric(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> HistogramMetric:
+    return _register(HistogramMetric(name, help_text, labelnames, buckets))
+
+
+def render_prometheus() -> str:
+    """همه متریک‌ها در قالب متنی Prometheus (نسخه 0.0.4)"""
+    lines = []
+    for metric in _registry.values():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> dict:
+    return {
+        "timestamp": time.time(),
+        "metrics": {name: metric.snapshot() for name, metric in _registry.items()},
+    }
+
+
+def write_json_snapshot(path: str):
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Metrics: failed to write snapshot {path}: {e}")
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        # بقیه هدرها خوانده و نادیده گرفته می‌شوند
+        while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/metrics", "/"):
+            body = render_prometheus().encode("utf-8")
+            status = "200 OK"
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"not found\n"
+            status = "404 Not Found"
+            content_type = "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """راه‌اندازی endpoint متنی Prometheus روی حلقه asyncio جاری (در صورت port > 0)"""
+    if port <= 0:
+        return None
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info(f"Metrics: Prometheus endpoint on http://{host}:{port}/metrics")
+    return server
+
+
+async def run_snapshot_writer(path: str = METRICS_SNAPSHOT_PATH, interval: int = METRICS_SNAPSHOT_INTERVAL):
+    """نوشتن دوره‌ای Snapshot JSON (برای محیط‌هایی که Prometheus ندارند)"""
+    if not path:
+        return
+    logger.info(f"Metrics: writing JSON snapshot to {path} every {interval}s")
+    while True:
+        await asyncio.sleep(interval)
+        write_json_snapshot(path)
+
+
+# --- متریک‌های مشترک ربات ---
+STAGE_SECONDS = histogram(
+    "scanner_stage_seconds", "Duration of each pipeline stage", ("stage",)
+)
+CHANNEL_FETCH_SECONDS = histogram(
+    "scanner_channel_fetch_seconds", "Duration of fetching one source channel", ("channel",)
+)
+PROVIDER_REQUEST_SECONDS = histogram(
+    "scanner_provider_request_seconds", "Latency of enrichment provider HTTP requests", ("provider", "status")
+)
+PROVIDER_RETRIES = counter(
+    "scanner_provider_retries_total", "Provider requests retried", ("provider", "status")
+)
+DEX_SEARCHES = counter(
+    "scanner_dex_searches_total", "Dexscreener symbol lookups by source (request, inflight, memo)", ("source",)
+)
+BREAKER_TRANSITIONS = counter(
+    "scanner_breaker_transitions_total", "Provider circuit breaker state changes", ("provider", "state")
+)
+FLOOD_WAITS = counter(
+    "scanner_flood_waits_total", "Telegram FloodWaitErrors", ("where",)
+)
+CACHE_LOOKUPS = counter(
+    "scanner_address_cache_lookups_total", "Address cache lookups", ("result",)
+)
+TOKENS_PARSED = counter(
+    "scanner_tokens_parsed_total", "Tokens extracted from heatmap blocks", ("chain",)
+)
+DEDUP_BLOCKS = counter(
+    "scanner_dedup_blocks_total", "Heatmap blocks checked by the deduplicator", ("result",)
+)
+LOG_RECORDS_DROPPED = counter(
+    "scanner_log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+CYCLES = counter(
+    "scanner_cycles_total", "Completed scan/publish cycles", ("mode",)
+)
+DEADLINE_EXCEEDED = counter(
+    "scanner_deadline_exceeded_total", "Stages or cycles that ran out of their time budget", ("stage",)
+)
+SKIPPED_TICKS = counter(
+    "scanner_skipped_ticks_total", "Scheduler ticks skipped because a cycle overran its interval"
+)
@@ -1,60 +1,141 @@
 """
-ماژول استخراج و پارس توکن‌های SOL و BNB از پیام‌های تلگرام
+ماژول استخراج و پارس توکن‌های زنجیره‌های فعال (modules/chains.py) از پیام‌های تلگرام
+- یک اسکن خطی روی هر پیام با الگوهای از پیش کامپایل‌شده (بدون Backtracking سنگین)
+- بلاک‌ها در همان اسکن بر اساس برچسب «$CHAIN Heatmap» به زنجیره مربوطه سپرده می‌شوند؛
+  افزودن زنجیره جدید پیمایش اضافه‌ای روی پیام‌ها ایجاد نمی‌کند
+- تولید تنبل (Generator) توکن‌ها برای پردازش حجم بالای تاریخچه
 """
 
 import re
 import logging
 
+from modules.metrics import TOKENS_PARSED
+from modules.chains import label_map
+
 logger = logging.getLogger(__name__)
 
-def parse_messages(messages: list) -> tuple[list, list]:
+# نشانگرهای متنی بلاک‌ها؛ جستجو با str.find انجام می‌شود که از alternation در re سریع‌تر است
+_TRENDING_MARK = "Trending"
+_HEATMAP_MARK = " Heatmap"
+_END_MARK = "Updated every"
+_LABELS = label_map()  # برچسب متن -> کلید زنجیره
+_MAX_CHAIN_LEN = max((len(label) for label in _LABELS), default=0) + 1  # با احتساب $
+
+# الگوی استخراج نماد توکن (پشتیبانی از انگلیسی، چینی و اعداد)
+_TOKEN_PATTERN = re.compile(
+    r"\d+\.\s+([$#]?[A-Za-z0-9\u4e00-\u9fa5]+)",
+    re.UNICODE
+)
+
+
+def iter_heatmap_blocks(text: str):
+    """
+    بلاک‌های Heatmap یک متن را در یک عبور خطی پیدا می‌کند.
+
+    هر بلاک از انتهای «$CHAIN Heatmap» شروع شده و تا «Updated every»، سرآغاز
+    بلاک بعدی یا انتهای متن ادامه دارد. مانند قبل، فقط بلاک‌هایی که پس از
+    کلمه Trending آمده‌اند معتبرند.
+
+    تفاوت با پارسر Regex قدیمی: اگر یک پیام پس از Trending چند بلاک از یک زنجیره داشته باشد
+    همه آن‌ها شمرده می‌شوند؛ الگوی حریصانه قدیمی («Trending.*$SOL Heatmap») فقط آخرین بلاک
+    هر زنجیره را برمی‌گرداند.
+
+    Yields:
+        tuple: (chain, start, end) - نام زنجیره و بازه بلاک در متن
     """
-    لیستی از آبجکت‌های پیام تلثون را گرفته و توکن‌های SOL و BNB را در دو لیست مجزا برمی‌گرداند.
-    
+    pos = text.find(_TRENDING_MARK)
+    if pos == -1:
+        return
+    pos += len(_TRENDING_MARK)
+
+    open_chain = None
+    open_start = 0
+    end_at = -1  # موقعیت اولین «Updated every» پس از شروع بلاک جاری
+
+    while True:
+        mark = text.find(_HEATMAP_MARK, pos)
+        if mark == -1:
+            break
+        pos = mark + len(_HEATMAP_MARK)
+
+        dollar = text.rfind("$", mark - _MAX_CHAIN_LEN, mark)
+        chain = _LABELS.get(text[dollar + 1:mark]) if dollar != -1 else None
+        if chain is None:
+            continue
+
+        if open_chain is not None:
+            yield open_chain, open_start, dollar if end_at == -1 or end_at > dollar else end_at
+
+        open_chain = chain
+        open_start = pos
+        end_at = text.find(_END_MARK, pos)
+
+    if open_chain is not None:
+        yield open_chain, open_start, len(text) if end_at == -1 else end_at
+
+
+def iter_block_tokens(messages, dedup=None):
+    """
+    پیام‌ها را به صورت تنبل پیمایش کرده و برای هر بلاک Heatmap لیست توکن‌هایش را تولید می‌کند.
+
     Args:
-        messages: لیست پیام‌های دریافتی از تلگرام
-        
-    Returns:
-        tuple: (sol_tokens, bnb_tokens) - دو لیست از نمادهای توکن
-    """
-    sol_tokens = []
-    bnb_tokens = []
-    
-    # الگوهای Regex برای شناسایی بلاک‌های Heatmap
-    bnb_block_pattern = r"Trending.*\$BNB Heatmap(.*?)(?:Updated every|$)"
-    sol_block_pattern = r"Trending.*\$SOL Heatmap(.*?)(?:Updated every|$)"
-    
-    # الگوی استخراج نماد توکن (پشتیبانی از انگلیسی، چینی و اعداد)
-    token_pattern = re.compile(
-        r"\d+\.\s+([$#]?[A-Za-z0-9\u4e00-\u9fa5]+)",
-        re.UNICODE
-    )
-    
-    parsed_count = 0
-    
+        messages: هر iterable از آبجکت‌های دارای ویژگی text (مثلاً پیام‌های تلثون)
+        dedup: BlockDeduplicator اختیاری؛ بلاک‌های تکراری پیش از شمارش حذف می‌شوند
+            (انقضای اثرانگشت‌ها بر حسب زمان پیام، در صورت داشتن ویژگی date)
+
+    Yields:
+        tuple: (chain, tokens) - مثلاً ("SOL", ["$WIF", "$BONK", ...])
+    """
     for message in messages:
         text = getattr(message, "text", None)
-        
+
         # بررسی معتبر بودن متن پیام
-        if not isinstance(text, str) or not text.strip():
+        if not isinstance(text, str) or not text:
             continue
-        
-        # استخراج بلاک‌های BNB
-        for bnb_block in re.findall(bnb_block_pattern, text, re.DOTALL):
-            tokens = token_pattern.findall(bnb_block)
-            normalized_tokens = [t.strip() for t in tokens if t.strip()]
-            bnb_tokens.extend(normalized_tokens)
-            if normalized_tokens:
-                parsed_count += 1
-        
-        # استخراج بلاک‌های SOL
-        for sol_block in re.findall(sol_block_pattern, text, re.DOTALL):
-            tokens = token_pattern.findall(sol_block)
-            normalized_tokens = [t.strip() for t in tokens if t.strip()]
-            sol_tokens.extend(normalized_tokens)
-            if normalized_tokens:
-                parsed_count += 1
-    
-    logger.debug(f"Parser: {parsed_count} بلاک Heatmap پردازش شد")
-    
-    return sol_tokens, bnb_tokens
+
+        date = getattr(message, "date", None) if dedup is not None else None
+        now = date.timestamp() if date is not None else None
+
+        for chain, start, end in iter_heatmap_blocks(text):
+            tokens = _TOKEN_PATTERN.findall(text, start, end)
+            if not tokens:
+                continue
+            if dedup is not None and dedup.check(chain, tokens, now=now)[0]:
+                continue
+            TOKENS_PARSED.inc(len(tokens), chain=chain)
+            yield chain, tokens
+
+
+def iter_heatmap_tokens(messages):
+    """
+    نسخه توکن به توکن iter_block_tokens.
+
+    Yields:
+        tuple: (chain, symbol) - مثلاً ("SOL", "$WIF")
+    """
+    for chain, tokens in iter_block_tokens(messages):
+        for symbol in tokens:
+            yield chain, symbol
+
+
+def parse_messages(messages: list, dedup=None) -> dict:
+    """
+    لیستی از آبجکت‌های پیام تلثون را گرفته و توکن‌های هر زنجیره فعال را جداگانه برمی‌گرداند.
+
+    Args:
+        messages: لیست پیام‌های دریافتی از تلگرام
+        dedup: BlockDeduplicator اختیاری برای حذف بلاک‌های تکراری
+
+    Returns:
+        dict: {chain: لیست نمادهای توکن} برای همه زنجیره‌های فعال
+    """
+    tokens = {chain: [] for chain in dict.fromkeys(_LABELS.values())}
+    parsed_count = 0
+
+    for chain, block_tokens in iter_block_tokens(messages, dedup):
+        tokens[chain].extend(block_tokens)
+        parsed_count += 1
+
+    logger.debug("Parser: %d بلاک Heatmap پردازش شد", parsed_count)
+
+    return tokens
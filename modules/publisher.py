@@ -0,0 +1,102 @@
+"""
+ماژول انتشار گزارش‌ها در کانال مقصد
+- حالت post: هر چرخه یک پیام جدید برای هر زنجیره (رفتار قبلی)
+- حالت edit: اگر متن تغییری نکرده باشد چیزی ارسال نمی‌شود، در غیر این صورت پیام قبلی
+  ویرایش می‌شود و فقط هر REPOST_INTERVAL_SECONDS یک پیام کاملاً جدید منتشر می‌شود
+- revise: تکمیل گزارش منتشرشده (مثلاً آدرس‌های دیررس) با ویرایش، به شرط آنکه گزارش
+  جدیدتری جای آن را نگرفته باشد
+"""
+
+import time
+import hashlib
+import logging
+from telethon.errors import (
+    MessageNotModifiedError,
+    MessageIdInvalidError,
+    MessageEditTimeExpiredError,
+    MessageAuthorRequiredError,
+)
+
+logger = logging.getLogger(__name__)
+
+POSTED = "posted"
+EDITED = "edited"
+UNCHANGED = "unchanged"
+
+
+def content_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ReportPublisher:
+    """ارسال یا ویرایش گزارش هر زنجیره با تشخیص تغییر (وضعیت در StateStore ذخیره می‌شود)"""
+
+    def __init__(self, client, chat_id, state, mode: str = "post", repost_interval: int = 6 * 3600):
+        self.client = client
+        self.chat_id = chat_id
+        self.state = state
+        self.mode = mode
+        self.repost_interval = repost_interval
+
+    async def publish(self, chain: str, text: str, now: float | None = None) -> str:
+        """
+        انتشار گزارش یک زنجیره.
+
+        Returns:
+            str: POSTED، EDITED یا UNCHANGED
+        """
+        now = time.time() if now is None else now
+        digest = content_digest(text)
+        previous = self.state.get_published(chain)
+
+        if (
+            self.mode == "edit"
+            and previous is not None
+            and now - previous["posted_at"] < self.repost_interval
+        ):
+            if previous["digest"] == digest:
+                return UNCHANGED
+            try:
+                await self.client.edit_message(self.chat_id, previous["message_id"], text, parse_mode="md")
+            except MessageNotModifiedError:
+                # متن رندرشده تلگرام یکسان است (مثلاً فقط فاصله‌ها فرق داشته‌اند)
+                self.state.set_published(chain, previous["message_id"], digest, previous["posted_at"])
+                return UNCHANGED
+            except (MessageIdInvalidError, MessageEditTimeExpiredError, MessageAuthorRequiredError) as e:
+                # پیام قبلی حذف شده یا دیگر قابل ویرایش نیست -> ارسال پیام جدید
+                logger.warning("Publisher: cannot edit %s report %s (%s), posting a new one",
+                               chain, previous["message_id"], type(e).__name__)
+            else:
+                self.state.set_published(chain, previous["message_id"], digest, previous["posted_at"])
+                return EDITED
+
+        message = await self.client.send_message(self.chat_id, text, parse_mode="md")
+        self.state.set_published(chain, message.id, digest, now)
+        return POSTED
+
+    async def revise(self, chain: str, published_text: str, text: str) -> str:
+        """
+        جایگزینی متن گزارشی که قبلاً با published_text منتشر شده است (در هر دو حالت post و edit).
+        اگر از آن زمان گزارش دیگری برای این زنجیره منتشر یا ویرایش شده باشد، کاری انجام نمی‌شود.
+
+        Returns:
+            str: EDITED یا UNCHANGED
+        """
+        previous = self.state.get_published(chain)
+        if previous is None or previous["digest"] != content_digest(published_text):
+            return UNCHANGED
+        digest = content_digest(text)
+        if digest == previous["digest"]:
+            return UNCHANGED
+        try:
+            await self.client.edit_message(self.chat_id, previous["message_id"], text, parse_mode="md")
+        except MessageNotModifiedError:
+            self.state.set_published(chain, previous["message_id"], digest, previous["posted_at"])
+            return UNCHANGED
+        except (MessageIdInvalidError, MessageEditTimeExpiredError, MessageAuthorRequiredError) as e:
+            # تکمیل گزارش ارزش ارسال پیام جدید را ندارد؛ چرخه بعد گزارش کامل را منتشر می‌کند
+            logger.warning("Publisher: cannot revise %s report %s (%s)",
+                           chain, previous["message_id"], type(e).__name__)
+            return UNCHANGED
+        self.state.set_published(chain, previous["message_id"], digest, previous["posted_at"])
+        return EDITED
@@ -0,0 +1,164 @@
+"""
+ماژول محدودکننده نرخ درخواست (Token Bucket) برای هر Provider
+- بودجه درخواست در ثانیه (RPS) قابل تنظیم از .env برای هر Provider
+- رعایت هدرهای Retry-After / RateLimit-Reset
+- Backoff نمایی با Jitter برای تلاش‌های مجدد
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# --- تنظیمات پیش‌فرض ---
+DEFAULT_RPS = float(os.getenv("PROVIDER_DEFAULT_RPS", 5))
+BACKOFF_BASE_SECONDS = float(os.getenv("BACKOFF_BASE_SECONDS", 1))
+BACKOFF_MAX_SECONDS = float(os.getenv("BACKOFF_MAX_SECONDS", 20))
+RETRY_AFTER_MAX_SECONDS = float(os.getenv("RETRY_AFTER_MAX_SECONDS", 60))
+
+
+def parse_retry_after(headers) -> float | None:
+    """
+    زمان انتظار پیشنهادی سرور را (به ثانیه) از هدرهای پاسخ استخراج می‌کند.
+    پشتیبانی از Retry-After (ثانیه یا تاریخ HTTP) و RateLimit-Reset / X-RateLimit-Reset.
+    """
+    if not headers:
+        return None
+
+    value = headers.get("retry-after")
+    if value:
+        value = value.strip()
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+
+    for name in ("ratelimit-reset", "x-ratelimit-reset"):
+        value = headers.get(name)
+        if not value:
+            continue
+        try:
+            reset = float(value)
+        except ValueError:
+            continue
+        # برخی APIها زمان مطلق (epoch) و برخی فاصله نسبی برمی‌گردانند
+        if reset > 1_000_000_000:
+            reset -= time.time()
+        return max(0.0, reset)
+
+    return None
+
+
+class RateLimiter:
+    """Token Bucket ساده و asyncio-safe با پشتیبانی از Backoff مشترک"""
+
+    def __init__(self, name: str, rate: float, burst: float | None = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+        # آمار برای لاگ و بنچمارک
+        self.requests = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+        self.backoff_seconds = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    async def acquire(self):
+        """تا زمان در دسترس بودن یک توکن (و پایان دوره جریمه) صبر می‌کند."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self.rate <= 0:
+                    break
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    wait = (1 - self._tokens) / self.rate
+                self.throttled_seconds += wait
+                await asyncio.sleep(wait)
+        self.requests += 1
+
+    def penalize(self, seconds: float):
+        """توقف همه درخواست‌های این Provider تا چند ثانیه (پس از 429)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    def backoff_delay(self, attempt: int, retry_after: float | None = None) -> float:
+        """محاسبه تاخیر Backoff نمایی با Jitter؛ در صورت وجود Retry-After همان رعایت می‌شود."""
+        if retry_after is not None:
+            return min(retry_after, RETRY_AFTER_MAX_SECONDS)
+        cap = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    async def backoff(self, attempt: int, status_code: int, headers=None, sleep: bool = True) -> float:
+        """
+        واکنش به پاسخ قابل تلاش مجدد. برای 429 کل Bucket جریمه می‌شود تا
+        درخواست‌های همزمان دیگر هم به سرور فشار نیاورند.
+
+        Returns:
+            float: مدت انتظار اعمال‌شده (ثانیه)
+        """
+        delay = self.backoff_delay(attempt, parse_retry_after(headers))
+        if status_code == 429:
+            self.rate_limited += 1
+            self.penalize(delay)
+        if sleep and delay > 0:
+            self.backoff_seconds += delay
+            await asyncio.sleep(delay)
+        return delay
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "backoff_seconds": round(self.backoff_seconds, 3),
+        }
+
+
+_limiters = {}
+
+
+def get_limiter(name: str) -> RateLimiter:
+    """
+    محدودکننده مشترک یک Provider را برمی‌گرداند.
+    نرخ از {NAME}_RPS و ظرفیت انفجاری از {NAME}_BURST در .env خوانده می‌شود.
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        prefix = name.upper()
+        rate = float(os.getenv(f"{prefix}_RPS", DEFAULT_RPS))
+        burst = os.getenv(f"{prefix}_BURST")
+        limiter = RateLimiter(name, rate, float(burst) if burst else None)
+        _limiters[name] = limiter
+        logger.debug("RateLimiter[%s]: rate=%s/s burst=%s", name, limiter.rate, limiter.burst)
+    return limiter
+
+
+def all_limiters() -> dict:
+    return dict(_limiters)
+
+
+def reset_limiters():
+    """حذف همه محدودکننده‌ها (مثلاً بین اجراهای بنچمارک یا پس از تغییر تنظیمات)"""
+    _limiters.clear()
@@ -0,0 +1,73 @@
+"""
+ماژول زمان‌بندی چرخه‌ها
+- CycleDeadline: مهلت کل هر چرخه به همراه بودجه جداگانه هر مرحله (fetch / enrich)
+- TickScheduler: چرخه‌ها روی مضرب‌های ثابت بازه (مثلاً :00 و :30) اجرا می‌شوند تا
+  زمان اجرای خود چرخه به تاخیر تجمعی تبدیل نشود
+"""
+
+import time
+
+
+class CycleDeadline:
+    """
+    مهلت یک چرخه. بودجه هر مرحله هیچ‌گاه از زمان باقی‌مانده کل چرخه بیشتر نیست،
+    پس مرحله‌ای که دیر شروع شده سهم مراحل بعد را مصرف نمی‌کند.
+    """
+
+    def __init__(self, total: float, budgets: dict | None = None, clock=time.monotonic):
+        self.total = total
+        self.budgets = dict(budgets or {})
+        self._clock = clock
+        self.started = clock()
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def remaining(self) -> float:
+        return max(0.0, self.total - self.elapsed())
+
+    def expired(self) -> bool:
+        return self.elapsed() >= self.total
+
+    def budget(self, stage: str) -> float:
+        """بودجه مرحله (ثانیه) از همین لحظه؛ برای مراحل بدون بودجه، کل زمان باقی‌مانده"""
+        return min(self.budgets.get(stage, self.total), self.remaining())
+
+
+def next_tick(interval: float, now: float | None = None) -> float:
+    """اولین مضرب interval (از مبدا Unix) بعد از now"""
+    now = time.time() if now is None else now
+    return (now // interval + 1) * interval
+
+
+class TickScheduler:
+    """
+    تیک‌های ساعت دیواری با بازه ثابت. چرخه‌ای که از بازه خود طولانی‌تر شود تیک‌های
+    ازدست‌رفته را جبران نمی‌کند؛ تعداد آن‌ها گزارش و مستقیماً به تیک آینده رفته می‌شود.
+    در حالت poll چرخه اول هنگام شروع برنامه (خارج از تیک) اجرا می‌شود؛ اگر اولین تیک کمتر از
+    min_first_gap بازه با آن فاصله داشته باشد رد می‌شود تا چرخه دوم فقط چند ثانیه داده نداشته باشد.
+    وقتی هنگام شروع چرخه‌ای اجرا نمی‌شود (حالت stream)، min_first_gap=0 است و اولین تیک حفظ می‌شود.
+    """
+
+    def __init__(self, interval: float, min_first_gap: float = 0.5):
+        self.interval = interval
+        self.min_first_gap = min_first_gap
+        self._last_tick = None
+
+    def advance(self, now: float | None = None) -> tuple[float, int]:
+        """
+        Returns:
+            tuple: (tick, skipped) - زمان Unix تیک بعدی و تعداد تیک‌های رد شده از تیک قبلی
+        """
+        now = time.time() if now is None else now
+        tick = next_tick(self.interval, now)
+        skipped = 0
+        if self._last_tick is None and tick - now < self.min_first_gap * self.interval:
+            tick += self.interval
+        elif self._last_tick is not None and tick <= self._last_tick:
+            # بیدار شدن زودهنگام (جابجایی ساعت سیستم) نباید همان تیک را دوباره اجرا کند
+            tick = self._last_tick + self.interval
+        elif self._last_tick is not None:
+            skipped = max(0, round((tick - self._last_tick) / self.interval) - 1)
+        self._last_tick = tick
+        return tick, skipped
@@ -0,0 +1,71 @@
+"""
+ماژول نگهداری وضعیت ربات بین چرخه‌ها و ری‌استارت‌ها (فایل JSON)
+- آخرین شناسه پیام پردازش‌شده برای هر کانال منبع
+- آخرین گزارش منتشرشده هر زنجیره (برای ویرایش درجا)
+"""
+
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StateStore:
+    """ذخیره‌ساز ساده کلید/مقدار روی فایل JSON با نوشتن اتمیک"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+            logger.debug(f"State: loaded {len(self._data)} keys from {self.path}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"State: failed to load {self.path}, starting fresh: {e}")
+            self._data = {}
+
+    def get(self, key: str, default=None):
+        return self._data.get(key, default)
+
+    def set(self, key: str, value):
+        self._data[key] = value
+
+    def save(self):
+        """نوشتن اتمیک (فایل موقت + rename) تا قطع برق فایل وضعیت را خراب نکند."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"State: failed to save {self.path}: {e}")
+
+    # --- آخرین پیام پردازش‌شده هر کانال ---
+
+    def get_last_seen(self, channel_id) -> int:
+        return int(self._data.get("last_seen_ids", {}).get(str(channel_id), 0))
+
+    def set_last_seen(self, channel_id, message_id: int):
+        last_seen = self._data.setdefault("last_seen_ids", {})
+        if message_id > int(last_seen.get(str(channel_id), 0)):
+            last_seen[str(channel_id)] = message_id
+            self.save()
+
+    # --- آخرین گزارش منتشرشده هر زنجیره ---
+
+    def get_published(self, chain: str) -> dict | None:
+        """{"message_id", "digest", "posted_at"} یا None اگر گزارشی ثبت نشده باشد"""
+        return self._data.get("published_reports", {}).get(chain)
+
+    def set_published(self, chain: str, message_id: int, digest: str, posted_at: float):
+        published = self._data.setdefault("published_reports", {})
+        published[chain] = {"message_id": message_id, "digest": digest, "posted_at": posted_at}
+        self.save()
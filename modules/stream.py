@@ -0,0 +1,132 @@
+"""
+ماژول حالت استریم: تجمیع پیوسته توکن‌ها از رویدادهای NewMessage / MessageEdited
+- هر پیام بلافاصله پارس شده و به شمارنده‌های جاری اضافه می‌شود
+- ویرایش پیام، سهم قبلی همان پیام را جایگزین می‌کند (شمارش دوباره نمی‌شود)
+- در صورت وجود، پنجره‌های لغزان (SlidingWindowAnalyzer) هم همزمان به‌روز می‌شوند
+- بلاک‌های تکراری (ریپست/فوروارد) با BlockDeduplicator حذف می‌شوند
+"""
+
+import logging
+from collections import Counter
+
+from modules.parser import iter_block_tokens
+from modules.chains import chain_keys
+
+logger = logging.getLogger(__name__)
+
+
+def _weighted(tokens: list, weight: float) -> Counter:
+    if weight == 1:
+        return Counter(tokens)
+    counts = Counter()
+    for symbol in tokens:
+        counts[symbol] += weight
+    return counts
+
+
+class StreamCollector:
+    """
+    شمارنده‌های جاری هر زنجیره فعال برای پیام‌های دریافتی از آخرین انتشار.
+    پیام‌ها با کلید (chat_id, message_id) نگه‌داری می‌شوند چون شناسه پیام فقط در هر کانال یکتاست.
+    """
+
+    def __init__(self, last_published_ids: dict | None = None, trend_windows=None, dedup=None):
+        self.last_published_ids = dict(last_published_ids or {})  # chat_id -> آخرین شناسه منتشرشده
+        self.trend_windows = trend_windows  # SlidingWindowAnalyzer اختیاری
+        self.dedup = dedup  # BlockDeduplicator اختیاری
+        self._fingerprints = {}  # (chat_id, message_id) -> اثرانگشت بلاک‌های پذیرفته‌شده
+        self.counters = {chain: Counter() for chain in chain_keys()}
+        self._contributions = {}  # (chat_id, message_id) -> {chain: Counter}
+        self._windowed = {}  # (chat_id, message_id) -> (timestamp, {chain: Counter}) ثبت‌شده در پنجره‌ها
+
+    def add(self, message, weight: float = 1) -> bool:
+        """
+        پارس یک پیام جدید یا ویرایش‌شده.
+
+        Args:
+            message: پیام تلثون
+            weight: وزن کانال منبع در شمارش
+
+        Returns:
+            bool: True اگر پیام در شمارنده‌ها اعمال شد
+        """
+        key = (message.chat_id, message.id)
+        if message.id <= self.last_published_ids.get(message.chat_id, 0):
+            # ویرایش پیامی که قبلاً منتشر شده است؛ شمارش دوباره نمی‌شود
+            return False
+
+        self._retract(key)
+        self._retract_windows(key)
+        if self.dedup is not None:
+            # نسخه قبلی همین پیام (پیش از ویرایش) نباید نسخه جدید را تکراری جلوه دهد
+            self.dedup.discard(self._fingerprints.pop(key, ()))
+
+        tokens = {}
+        fingerprints = []
+        for chain, block_tokens in iter_block_tokens((message,)):
+            if self.dedup is not None:
+                duplicate, fingerprint = self.dedup.check(chain, block_tokens)
+                if duplicate:
+                    continue
+                fingerprints.append(fingerprint)
+            if block_tokens:
+                tokens.setdefault(chain, []).extend(block_tokens)
+        if fingerprints:
+            self._fingerprints[key] = fingerprints
+
+        if not tokens:
+            return False
+
+        contribution = {chain: _weighted(chain_tokens, weight) for chain, chain_tokens in tokens.items()}
+        self._contributions[key] = contribution
+        for chain, counts in contribution.items():
+            self.counters[chain].update(counts)
+
+        if self.trend_windows is not None:
+            timestamp = message.date.timestamp()
+            for chain, counts in contribution.items():
+                self.trend_windows.add(chain, counts, timestamp)
+            self._windowed[key] = (timestamp, contribution)
+        if logger.isEnabledFor(logging.DEBUG):
+            # این مسیر برای هر پیام اجرا می‌شود؛ رشته خلاصه فقط در سطح DEBUG ساخته می‌شود
+            logger.debug(
+                "Stream: msg %s -> %s (w=%s)",
+                key, ", ".join(f"{len(chain_tokens)} {chain}" for chain, chain_tokens in tokens.items()), weight,
+            )
+        return True
+
+    def _retract(self, key):
+        previous = self._contributions.pop(key, None)
+        if previous is not None:
+            for chain, counts in previous.items():
+                self.counters[chain] -= counts
+
+    def _retract_windows(self, key):
+        previous = self._windowed.pop(key, None)
+        if previous is not None:
+            timestamp, contribution = previous
+            for chain, counts in contribution.items():
+                self.trend_windows.remove(chain, counts, timestamp)
+
+    def snapshot(self) -> tuple[dict, list]:
+        """
+        کپی شمارنده‌های فعلی برای انتشار.
+
+        Returns:
+            tuple: ({chain: Counter}, message_keys)
+        """
+        counters = {chain: Counter(counts) for chain, counts in self.counters.items()}
+        return counters, list(self._contributions)
+
+    def commit(self, message_keys: list):
+        """پس از انتشار موفق، سهم پیام‌های منتشرشده حذف می‌شود (پیام‌های رسیده در حین انتشار باقی می‌مانند)."""
+        for key in message_keys:
+            self._retract(key)
+            # پیام منتشرشده دیگر ویرایش‌پذیر نیست، پس سهمش در پنجره‌ها ثابت می‌ماند
+            self._windowed.pop(key, None)
+            self._fingerprints.pop(key, None)
+            chat_id, message_id = key
+            if message_id > self.last_published_ids.get(chat_id, 0):
+                self.last_published_ids[chat_id] = message_id
+        if self.dedup is not None:
+            self.dedup.commit()
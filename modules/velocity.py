@@ -0,0 +1,124 @@
+"""
+ماژول امتیازدهی سرعت ترند (Velocity) به صورت برداری با NumPy
+- ورودی: ماتریس شمارش (نماد × دوره) که ستون آخر آن دوره جاری است
+- نرخ تغییر، شتاب و امتیاز ناهنجاری (z-score نسبت به دوره‌های قبل) برای همه نمادها یکجا
+- نمادهای تازه و پرشتاب به جای نمادهای همیشه پرتکرار در صدر قرار می‌گیرند
+"""
+
+import os
+import time
+import logging
+import numpy as np
+from collections import Counter
+
+from modules.analyzer import analyze_frequency, columns_to_matrix
+
+logger = logging.getLogger(__name__)
+
+VELOCITY_MIN_COUNT = float(os.getenv("VELOCITY_MIN_COUNT", 2))  # حداقل شمارش دوره جاری برای رتبه‌بندی
+VELOCITY_RATE_WEIGHT = float(os.getenv("VELOCITY_RATE_WEIGHT", 1.0))
+VELOCITY_ACCEL_WEIGHT = float(os.getenv("VELOCITY_ACCEL_WEIGHT", 0.5))
+VELOCITY_MIN_PERIODS = 3  # دوره جاری + حداقل دو دوره قبلی برای محاسبه شتاب
+
+
+def velocity_scores(matrix: np.ndarray) -> dict:
+    """
+    محاسبه برداری شاخص‌ها برای همه ردیف‌ها.
+
+    Args:
+        matrix: آرایه (n_symbols, n_periods) با حداقل VELOCITY_MIN_PERIODS ستون
+
+    Returns:
+        dict: آرایه‌های current، rate، acceleration، zscore و score (هر کدام به طول n_symbols)
+    """
+    current, previous, before = matrix[:, -1], matrix[:, -2], matrix[:, -3]
+    baseline = matrix[:, :-1]
+    mean = baseline.mean(axis=1)
+    std = baseline.std(axis=1)
+
+    rate = current - previous
+    acceleration = rate - (previous - before)
+    # +1 در مخرج‌ها: جلوگیری از تقسیم بر صفر و کاهش وزن نمادهای بسیار کم‌تکرار
+    zscore = (current - mean) / (std + 1.0)
+    score = (
+        zscore
+        + VELOCITY_RATE_WEIGHT * rate / (previous + 1.0)
+        + VELOCITY_ACCEL_WEIGHT * acceleration / (mean + 1.0)
+    )
+    return {
+        "current": current,
+        "rate": rate,
+        "acceleration": acceleration,
+        "zscore": zscore,
+        "score": score,
+    }
+
+
+def rank_velocity(symbols: list, matrix: np.ndarray, k: int = 5) -> list:
+    """
+    تاپ k نماد بر اساس امتیاز سرعت.
+
+    Returns:
+        list: (symbol, count) با شمارش دوره جاری، مرتب بر اساس امتیاز
+    """
+    if not symbols:
+        return []
+    scores = velocity_scores(matrix)
+    score = np.where(scores["current"] >= VELOCITY_MIN_COUNT, scores["score"], -np.inf)
+    k = min(k, len(symbols))
+    candidates = np.argpartition(-score, k - 1)[:k]
+    ordered = candidates[np.argsort(-score[candidates], kind="stable")]
+    return [
+        (symbols[i], round(float(scores["current"][i]), 2))
+        for i in ordered
+        if np.isfinite(score[i])
+    ]
+
+
+def with_current_period(symbols: list, history: np.ndarray, current: Counter) -> tuple[list, np.ndarray]:
+    """افزودن شمارش دوره جاری به عنوان ستون آخر ماتریس تاریخچه (نمادهای جدید با تاریخچه صفر)"""
+    symbols = list(symbols)
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    for symbol in current:
+        if symbol not in index:
+            index[symbol] = len(symbols)
+            symbols.append(symbol)
+
+    matrix = np.zeros((len(symbols), history.shape[1] + 1))
+    matrix[:history.shape[0], :-1] = history
+    if current:
+        rows = np.fromiter((index[symbol] for symbol in current), dtype=np.intp, count=len(current))
+        matrix[rows, -1] = np.fromiter(current.values(), dtype=float, count=len(current))
+    return symbols, matrix
+
+
+def counters_to_matrix(counters: list) -> tuple[list, np.ndarray]:
+    """تبدیل لیست Counter های دوره‌ای (قدیمی‌ترین اول) به (symbols, matrix)"""
+    return columns_to_matrix(enumerate(counters), len(counters))
+
+
+def analyze_velocity(tokens_by_chain: dict, trend_windows, period_seconds: int, now: float | None = None) -> dict:
+    """
+    معادل analyze_frequency با رتبه‌بندی سرعت: شمارش دوره جاری با دوره‌های قبلی
+    ذخیره‌شده در SlidingWindowAnalyzer مقایسه می‌شود.
+
+    Returns:
+        dict: {chain: لیست (symbol, count)}
+    """
+    periods = trend_windows.history_periods(period_seconds) - 1
+    if periods + 1 < VELOCITY_MIN_PERIODS:
+        logger.warning(
+            "Velocity: windows cover only %d periods of %ss; falling back to frequency ranking",
+            periods + 1, period_seconds,
+        )
+        return analyze_frequency(tokens_by_chain)
+
+    # تاریخچه تا ابتدای دوره جاری؛ خود دوره جاری از شمارنده همین چرخه می‌آید
+    history_end = (time.time() if now is None else now) - period_seconds
+    results = {}
+    for chain, tokens in tokens_by_chain.items():
+        symbols, history = trend_windows.bucket_matrix(chain, period_seconds, periods, history_end)
+        symbols, matrix = with_current_period(symbols, history, Counter(tokens))
+        results[chain] = rank_velocity(symbols, matrix)
+        logger.debug("Velocity: %s scored %d symbols over %d periods", chain, len(symbols), matrix.shape[1])
+    return results
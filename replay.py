@@ -0,0 +1,237 @@
+"""
+Replay / Backtest آفلاین روی خروجی JSONL تاریخچه کانال‌ها
+پیام‌ها به چرخه‌های LOOP_INTERVAL_SECONDS تقسیم شده، بازه‌های زمانی بین Process Pool پخش می‌شوند
+و رتبه‌بندی هر چرخه (همان خروجی parse → analyze → format) بدون اتصال به تلگرام تولید می‌شود.
+
+اجرا:
+    python replay.py dumps/*.jsonl --interval 1800 --workers 4 --enrich cache
+    python replay.py dumps/*.jsonl --analyzer velocity --velocity-periods 48
+
+قالب هر خط JSONL: {"id": 123, "date": "2024-05-01T12:00:00+00:00" | 1714564800, "text": "..."}
+(کلید "message" خروجی to_dict تلثون هم به جای "text" پذیرفته می‌شود)
+
+تفاوت با حالت زنده:
+- حذف بلاک‌های تکراری (BlockDeduplicator) مثل ربات با TTL نسبت به زمان پیام انجام می‌شود
+  (--dedup-ttl، پیش‌فرض DEDUP_TTL_SECONDS؛ 0 = غیرفعال)، اما هر تکه --chunk-size پیامی
+  مجموعه اثرانگشت خودش را دارد و تکراری‌هایی که دو طرف مرز دو تکه باشند حذف نمی‌شوند
+- Dump شناسه کانال ندارد، پس وزن کانال‌ها (SOURCE_CHANNELS) اعمال نمی‌شود و هر پیام وزن ۱ دارد
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import sys
+import json
+import logging
+import argparse
+from datetime import datetime, UTC
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from types import SimpleNamespace
+
+from modules.parser import iter_block_tokens
+from modules.chains import chain_keys
+from modules.dedup import BlockDeduplicator, DEDUP_ENABLED, DEDUP_TTL_SECONDS
+from modules.analyzer import analyze_frequency
+from modules.velocity import counters_to_matrix, rank_velocity, VELOCITY_MIN_PERIODS
+from modules.formatter import format_output_message
+from modules.cache import AddressCache, ADDRESS_CACHE_PATH, MISS
+from modules.enricher import normalize_lookup_key
+
+logger = logging.getLogger("replay")
+
+
+def _parse_timestamp(value) -> float | None:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=UTC)
+        return parsed.timestamp()
+    return None
+
+
+def iter_dump_records(paths: list):
+    """
+    خواندن جریانی فایل‌های JSONL بدون بارگذاری کامل در حافظه.
+
+    Yields:
+        tuple: (timestamp, text)
+    """
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"{path}:{line_no}: invalid JSON, skipped")
+                    continue
+                text = record.get("text") or record.get("message")
+                timestamp = _parse_timestamp(record.get("date"))
+                if not isinstance(text, str) or timestamp is None:
+                    continue
+                yield timestamp, text
+
+
+def count_chunk(items: list, dedup_ttl: int = 0) -> dict:
+    """
+    کار هر Worker: پارس یک تکه از پیام‌ها و شمارش جزئی به تفکیک چرخه.
+    پیام‌ها به ترتیب زمان پارس می‌شوند تا حذف تکراری‌ها مثل حالت زنده باشد.
+
+    Args:
+        items: لیست (cycle, timestamp, text)
+        dedup_ttl: TTL اثرانگشت بلاک‌ها بر حسب زمان پیام (0 = بدون حذف تکراری)
+
+    Returns:
+        dict: {cycle: {chain: Counter}}
+    """
+    dedup = BlockDeduplicator(ttl=dedup_ttl) if dedup_ttl > 0 else None
+    partial = {}
+    for cycle, timestamp, text in sorted(items, key=lambda item: item[1]):
+        counters = partial.get(cycle)
+        if counters is None:
+            counters = partial[cycle] = {chain: Counter() for chain in chain_keys()}
+        for chain, block_tokens in iter_block_tokens((SimpleNamespace(text=text),)):
+            if dedup is not None and dedup.check(chain, block_tokens, now=timestamp)[0]:
+                continue
+            counters[chain].update(block_tokens)
+    return partial
+
+
+def _merge(totals: dict, partial: dict):
+    for cycle, counters in partial.items():
+        if cycle not in totals:
+            totals[cycle] = counters
+            continue
+        for chain, counter in counters.items():
+            totals[cycle].setdefault(chain, Counter()).update(counter)
+
+
+def replay(
+    paths: list, interval: int, workers: int, chunk_size: int, cycles_per_shard: int, dedup_ttl: int = 0
+) -> dict:
+    """
+    اجرای موازی شمارش روی کل تاریخچه.
+    هر Shard یک بازه زمانی پیوسته (cycles_per_shard چرخه) است و شمارنده‌های جزئی در پایان ادغام می‌شوند.
+
+    Returns:
+        dict: {cycle: {chain: Counter}}
+    """
+    totals = {}
+    buffers = defaultdict(list)
+
+    if workers <= 1:
+        for timestamp, text in iter_dump_records(paths):
+            cycle = int(timestamp // interval)
+            buffers[cycle // cycles_per_shard].append((cycle, timestamp, text))
+            if len(buffers[cycle // cycles_per_shard]) >= chunk_size:
+                _merge(totals, count_chunk(buffers.pop(cycle // cycles_per_shard), dedup_ttl))
+        for items in buffers.values():
+            _merge(totals, count_chunk(items, dedup_ttl))
+        return totals
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+
+        def submit(items):
+            nonlocal pending
+            # سقف کارهای در صف تا مصرف حافظه با اندازه Dump رشد نکند
+            while len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _merge(totals, future.result())
+            pending.add(pool.submit(count_chunk, items, dedup_ttl))
+
+        for timestamp, text in iter_dump_records(paths):
+            cycle = int(timestamp // interval)
+            shard = cycle // cycles_per_shard
+            buffers[shard].append((cycle, timestamp, text))
+            if len(buffers[shard]) >= chunk_size:
+                submit(buffers.pop(shard))
+
+        for items in buffers.values():
+            submit(items)
+
+        for future in pending:
+            _merge(totals, future.result())
+
+    return totals
+
+
+def _rank_cycle(totals: dict, cycle: int, analyzer: str, periods: int) -> dict:
+    """رتبه‌بندی یک چرخه؛ در حالت velocity چرخه‌های قبلی Replay تاریخچه امتیازدهی هستند."""
+    counters = totals[cycle]
+    if analyzer != "velocity" or periods < VELOCITY_MIN_PERIODS:
+        return analyze_frequency(counters)
+    window = [totals.get(c, {}) for c in range(cycle - periods + 1, cycle + 1)]
+    return {
+        chain: rank_velocity(*counters_to_matrix([counts.get(chain, Counter()) for counts in window]))
+        for chain in counters
+    }
+
+
+def _enrich_offline(top: list, network: str, cache) -> list:
+    """غنی‌سازی بدون شبکه: آدرس فقط از کش محلی خوانده می‌شود (در غیر این صورت خالی)"""
+    enriched = []
+    for symbol, count in top:
+        address = ""
+        if cache is not None:
+            cached = cache.get(*normalize_lookup_key(symbol, network))
+            address = "" if cached is MISS else cached
+        enriched.append((symbol, count, address))
+    return enriched
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Offline replay/backtest of trend rankings")
+    arg_parser.add_argument("paths", nargs="+", help="JSONL dump files")
+    arg_parser.add_argument("--interval", type=int, default=1800, help="cycle length in seconds")
+    arg_parser.add_argument("--workers", type=int, default=1, help="process pool size")
+    arg_parser.add_argument("--chunk-size", type=int, default=5000, help="messages per worker task")
+    arg_parser.add_argument("--cycles-per-shard", type=int, default=48, help="time-range shard size in cycles")
+    arg_parser.add_argument("--dedup-ttl", type=int, default=DEDUP_TTL_SECONDS if DEDUP_ENABLED else 0,
+                            help="drop repeated heatmap blocks seen within this many seconds (0 = off)")
+    arg_parser.add_argument("--analyzer", choices=("frequency", "velocity"), default="frequency")
+    arg_parser.add_argument("--velocity-periods", type=int, default=48, help="cycles of history scored in velocity mode")
+    arg_parser.add_argument("--enrich", choices=("none", "cache"), default="none")
+    arg_parser.add_argument("--cache-path", default=ADDRESS_CACHE_PATH)
+    arg_parser.add_argument("--format", choices=("jsonl", "text"), default="jsonl")
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+    totals = replay(
+        args.paths, args.interval, args.workers, args.chunk_size, args.cycles_per_shard, args.dedup_ttl
+    )
+    logger.info(f"Replay: {len(totals)} cycles")
+
+    cache = AddressCache(args.cache_path) if args.enrich == "cache" else None
+    try:
+        for cycle in sorted(totals):
+            tops = _rank_cycle(totals, cycle, args.analyzer, args.velocity_periods)
+            enriched = {chain: _enrich_offline(top, chain, cache) for chain, top in tops.items()}
+            cycle_start = datetime.fromtimestamp(cycle * args.interval, UTC).isoformat()
+
+            if args.format == "text":
+                print(f"===== {cycle_start} =====")
+                for message in format_output_message(enriched).values():
+                    if message:
+                        print(message + "\n")
+            else:
+                record = {"cycle_start": cycle_start}
+                record.update((chain.lower(), top) for chain, top in enriched.items())
+                print(json.dumps(record, ensure_ascii=False))
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
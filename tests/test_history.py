@@ -0,0 +1,101 @@
+"""
+تست رفت و برگشت قالب دودویی تاریخچه (modules/history.py)
+
+اجرا:
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+from datetime import datetime, UTC
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.history import HistoryStore, HistoryLockedError, RECORD_SIZE  # noqa: E402
+
+T0 = int(datetime(2024, 5, 1, tzinfo=UTC).timestamp())
+JUNE = int(datetime(2024, 6, 1, tzinfo=UTC).timestamp())
+
+
+def _fill(store):
+    store.append(T0, "SOL", {"$WIF": 3, "$BONK": 1})
+    store.append(T0 + 1800, "SOL", {"$WIF": 2})
+    store.append(T0 + 1800, "BNB", {"$CAKE": 4, "$WIF": 1})
+    store.append(JUNE, "SOL", {"$BONK": 4})
+
+
+def test_round_trip_after_reopen(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    _fill(store)
+    store.close()
+
+    store = HistoryStore(str(tmp_path))
+    assert store.string(store.lookup("$WIF")) == "$WIF"
+    assert store.top_k(k=3) == [("$WIF", 6.0), ("$BONK", 5.0), ("$CAKE", 4.0)]
+    assert store.top_k(end=JUNE, k=2, chain="SOL") == [("$WIF", 5.0), ("$BONK", 1.0)]
+    assert store.series("$WIF", chain="SOL") == [(T0, 3.0), (T0 + 1800, 2.0)]
+    assert store.series("$WIF", bucket_seconds=3600) == [(T0, 6.0)]
+    assert store.series("$MISSING") == []
+    assert sorted(os.listdir(tmp_path)) == ["2024-05.bin", "2024-06.bin", "history.lock", "symbols.txt"]
+
+    # رکوردهای جدید پس از باز کردن دوباره به همان شناسه‌های نماد اشاره می‌کنند
+    store.append(T0 + 3600, "SOL", {"$WIF": 1})
+    assert store.series("$WIF", chain="SOL", start=T0 + 1) == [(T0 + 1800, 2.0), (T0 + 3600, 1.0)]
+    store.close()
+
+
+def test_reopen_truncates_partial_record(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    _fill(store)
+    store.close()
+
+    segment = tmp_path / "2024-05.bin"
+    size = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(b"\x01\x02\x03")  # نوشتن نیمه‌کاره
+
+    store = HistoryStore(str(tmp_path))
+    store.append(T0 + 3600, "SOL", {"$BONK": 2})
+    assert segment.stat().st_size == size + RECORD_SIZE
+    assert store.series("$BONK", chain="SOL", end=JUNE) == [(T0, 1.0), (T0 + 3600, 2.0)]
+    store.close()
+
+
+def test_out_of_order_append_uses_full_scan(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append(T0 + 7200, "SOL", {"$WIF": 1})
+    store.append(T0, "SOL", {"$WIF": 10})
+    store.append(T0 + 3600, "SOL", {"$WIF": 100})
+    assert (tmp_path / "2024-05.unsorted").exists()
+
+    assert store.series("$WIF", start=T0 + 1, end=T0 + 7200) == [(T0 + 3600, 100.0)]
+    assert store.top_k(start=T0, end=T0 + 3600) == [("$WIF", 10.0)]
+    store.close()
+
+
+def test_second_writer_is_rejected(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    with pytest.raises(HistoryLockedError):
+        HistoryStore(str(tmp_path))
+    store.close()
+    HistoryStore(str(tmp_path)).close()
+
+
+def test_compact_restores_sorted_segment(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.append(T0 + 7200, "SOL", {"$WIF": 1})
+    store.append(T0, "SOL", {"$WIF": 10})
+    store.append(T0 + 3600, "SOL", {"$WIF": 100, "$BONK": 5})
+
+    assert store.compact() == 1
+    assert not (tmp_path / "2024-05.unsorted").exists()
+    assert [record[0] for record in store.iter_raw()] == [T0, T0 + 3600, T0 + 3600, T0 + 7200]
+    assert store.series("$WIF", start=T0 + 1, end=T0 + 7200) == [(T0 + 3600, 100.0)]
+
+    # پس از compact، append در ترتیب زمان نشانگر جدیدی نمی‌سازد
+    store.append(T0 + 9000, "SOL", {"$WIF": 1})
+    assert not (tmp_path / "2024-05.unsorted").exists()
+    assert store.compact() == 0
+    store.close()